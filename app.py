@@ -1,26 +1,38 @@
 import os
 import re
-import smtplib
 import time
 import urllib.parse
-import base64
+import math
+import json
 import streamlit as st
 from zoneinfo import ZoneInfo
 from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
 from email.mime.text import MIMEText
-from email import encoders
 from io import BytesIO
-from datetime import datetime,timezone
+from datetime import datetime, timedelta
 import pytz
-import qrcode
 from email.mime.application import MIMEApplication
 import pandas as pd
 import streamlit.components.v1 as components
 import razorpay
 from privacy_policy import privacy_policy_component
 from send_mail import send_daily_orders_email
-import datetime as dt
+from menu_store import read_menu, read_menu_index, read_image_manifest, missing_images, write_menu, menu_cache_stats
+from thumbnails import cached_thumbnail
+from receipt_pdf import receipt_fonts, receipt_pdf_bytes
+from receipt_layout import build_receipt_layout, render_escpos, render_text, send_to_printer
+from upi_qr import upi_link as build_upi_link, upi_qr_png
+from payment_links import get_payment_link_manager
+from payment_reconciler import get_payment_reconciler
+from static_assets import get_asset_manager
+from sales_analytics import sales_report
+from pickup_scheduler import SLOT_CAPACITY, SLOT_MINUTES, get_pickup_scheduler, order_prep
+from bill import Bill
+from order_log import get_order_writer
+from order_store import get_order_store
+from outbox import get_outbox
+from smtp_transport import get_secret
+from report_scheduler import get_report_scheduler
 
 # =====================================================
 # PAGE CONFIG  (MUST BE FIRST STREAMLIT COMMAND)
@@ -49,13 +61,23 @@ PICKUP_TIME_SLOTS = [
     "Ready in 30–45 minutes",
     "Ready in 45–60 minutes",
     "Select specific pickup time",]# --- END PATH SETUP ---
+# Minutes from now each choice allows (None: the customer picks a time)
+PICKUP_WINDOWS = dict(zip(PICKUP_TIME_SLOTS, [(20, 30), (30, 45), (45, 60), None]))
 
 RAZORPAY_KEY_ID = st.secrets.get("RAZORPAY_KEY_ID")
 RAZORPAY_KEY_SECRET = st.secrets.get("RAZORPAY_KEY_SECRET")
 
+RAZORPAY_BASE_URL = st.secrets.get("RAZORPAY_BASE_URL")   # optional, e.g. a local stand-in for testing
+
 razorpay_client = None
 if RAZORPAY_KEY_ID and RAZORPAY_KEY_SECRET:
-    razorpay_client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
+    razorpay_client = razorpay.Client(
+        auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET),
+        **({"base_url": RAZORPAY_BASE_URL} if RAZORPAY_BASE_URL else {}),
+    )
+
+asset_manager = get_asset_manager()
+STATIC_SERVING = bool(st.get_option("server.enableStaticServing"))
 
 # ReportLab for PDF
 canvas = None
@@ -71,13 +93,6 @@ except ImportError:
 # =========================
 # APPLY CSS FIRST - BEFORE ANY HTML
 # =========================
-img = ""
-try:
-    with open(BACKGROUND_PATH, "rb") as f:
-        img = base64.b64encode(f.read()).decode()
-except FileNotFoundError:
-    pass
-
 # =====================================================
 # GLOBAL CSS (SAFE & ISOLATED)
 # =====================================================
@@ -171,16 +186,19 @@ st.markdown(
     }}
 
     /* --------------------------------------- */
-    /* PROFESSIONAL TABS STYLING (Pill Style) */
+    /* MENU CATEGORY PILLS (horizontal st.radio) */
     /* --------------------------------------- */
-    
-    /* Style the individual tab buttons */
-    button[data-baseweb="tab"] {{
+    .st-key-menu_category [data-testid="stRadioGroup"] {{
+        gap: 12px;
+        flex-wrap: wrap;
+    }}
+
+    .st-key-menu_category [data-testid="stRadioOption"] {{
         background-color: #ffffff;
         border: 1px solid #e0e0e0;
         border-radius: 30px; /* Makes them pill-shaped */
         padding: 8px 24px;
-        margin-right: 12px; /* Space between tabs */
+        margin: 0;
         color: #555555;
         font-weight: 600;
         font-size: 15px;
@@ -188,30 +206,30 @@ st.markdown(
         transition: all 0.3s ease;
     }}
 
+    /* Hide the radio circle; the pill itself shows the selection */
+    .st-key-menu_category [data-testid="stRadioOption"] > div > div:first-child {{
+        display: none;
+    }}
+
+    .st-key-menu_category [data-testid="stRadioOption"] p {{
+        color: inherit;
+        font-weight: inherit;
+    }}
+
     /* Hover effect */
-    button[data-baseweb="tab"]:hover {{
+    .st-key-menu_category [data-testid="stRadioOption"]:hover {{
         background-color: #fff5f2;
         color: #e5653e;
         border-color: #e5653e;
     }}
 
-    /* Active (Selected) Tab Style - Brand Orange */
-    button[data-baseweb="tab"][aria-selected="true"] {{
+    /* Selected category - Brand Orange */
+    .st-key-menu_category [data-testid="stRadioOption"]:has(input:checked) {{
         background-color: #e5653e !important;
         color: white !important;
         border-color: #e5653e !important;
         box-shadow: 0 4px 10px rgba(229, 101, 62, 0.3) !important;
     }}
-
-    /* Remove the default underline animation from Streamlit */
-    div[data-baseweb="tab-highlight"] {{
-        display: none;
-    }}
-    
-    /* Optional: Remove the faint line below the tabs */
-    div[data-baseweb="tab-border"] {{
-        display: none;
-    }}
     </style>
     """,
     unsafe_allow_html=True
@@ -277,18 +295,20 @@ with c2:
         unsafe_allow_html=True
     )
 
+# Header QR images: prepared once per process and served from static/ by URL
+# (or a cached data URI when static serving is off), so reruns don't re-encode them
+qr_app_src = asset_manager.url(QR_CODE_APP_PATH, 480, static=STATIC_SERVING)
+qr_rev_src = asset_manager.url(QR_Review_APP_PATH, 480, static=STATIC_SERVING)
+
 # APP DOWNLOAD QR (Clickable)
 with c3:
     # 1. APP DOWNLOAD QR
-    if os.path.exists(QR_CODE_APP_PATH):
+    if qr_app_src:
         try:
-            with open(QR_CODE_APP_PATH, "rb") as f:
-                qr_app_b64 = base64.b64encode(f.read()).decode()
-            
             st.markdown(f"""
                 <div style="text-align: center; margin-bottom: 10px;">
                     <a href="{APP_DOWNLOAD_URL}" target="_blank">
-                        <img src="data:image/png;base64,{qr_app_b64}" width="240" style="border-radius:8px; border: 2px solid white; cursor:pointer;" alt="Download App">
+                        <img src="{qr_app_src}" width="240" style="border-radius:8px; border: 2px solid white; cursor:pointer;" alt="Download App">
                     </a>
                     <div style="color:#222; font-size:10px; margin-top:2px;">Scan to Download</div>
                 </div>
@@ -299,15 +319,12 @@ with c3:
         st.info("App QR Missing")
 
     # 2. GOOGLE REVIEW QR
-    if os.path.exists(QR_Review_APP_PATH):
+    if qr_rev_src:
         try:
-            with open(QR_Review_APP_PATH, "rb") as f:
-                qr_rev_b64 = base64.b64encode(f.read()).decode()
-
             st.markdown(f"""
                 <div style="text-align: center;">
                     <a href="{GOOGLE_REVIEW_URL}" target="_blank">
-                        <img src="data:image/png;base64,{qr_rev_b64}" width="240" style="border-radius:8px; border: 2px solid white; cursor:pointer;" alt="Rate Us">
+                        <img src="{qr_rev_src}" width="240" style="border-radius:8px; border: 2px solid white; cursor:pointer;" alt="Rate Us">
                     </a>
                     <div style="color:#222; font-size:10px; margin-top:2px;">Scan to Rate</div>
                 </div>
@@ -325,28 +342,24 @@ st.info("🛍️ Pickup Only | No Delivery Available. Please collect your order
 # CONFIG
 # =========================
 MENU_EXCEL = os.path.join(APP_DIR, "DhalisMenu_cat.xlsx")
-ORDERS_DIR = "Orders"  # daily order logs
+MENU_CATEGORIES = ["Fast Food", "Drinks", "Bakery", "Snacks"]
+MENU_PAGE_SIZE = 12  # items rendered per page of the menu grid (0 = no paging)
+FINALIZED_CLEAR_SECONDS = 60     # a finalized order stays on screen this long
+INACTIVITY_CLEAR_SECONDS = 900   # an unfinished bill is cleared after 15 minutes without activity
 ADMIN_PASSWORD = "admin123"  # change after first run
 
 # Consolidated CSV path (same directory as this app.py)
 ORDERS_CSV = os.path.join(os.path.dirname(__file__), "orders.csv")
 
 
-def get_secret(key: str, default: str = "") -> str:
-    try:
-        return st.secrets[key]
-    except Exception:
-        return os.environ.get(key, default)
-
-
 DEFAULT_SMTP_SERVER = get_secret("SMTP_SERVER", "smtp.gmail.com")
 DEFAULT_SMTP_PORT = int(get_secret("SMTP_PORT", "587"))
 DEFAULT_SENDER_EMAIL = get_secret("SENDER_EMAIL", "")
 DEFAULT_SENDER_PASSWORD = get_secret("SENDER_PASSWORD", "")
+RECEIPT_PRINTER = get_secret("RECEIPT_PRINTER", "")   # e.g. 192.168.1.50:9100 or /dev/usb/lp0
 
 _defaults = {
-    "bill": [],
-    "total": 0.0,
+    "bill": None,
     "cust_name": "",
     "cust_phone": "",
     "cust_addr": "",
@@ -365,10 +378,15 @@ _defaults = {
     "last_activity": time.time(),
     "order_finalized_time": None,
     "show_upi": False,
+    "order_id": None,
+    "pickup_from": None,
+    "pickup_time": None,
 }
 for k, v in _defaults.items():
     if k not in st.session_state:
         st.session_state[k] = v
+if st.session_state["bill"] is None:
+    st.session_state["bill"] = Bill()
 
 # =========================
 # HELPERS
@@ -377,33 +395,14 @@ for k, v in _defaults.items():
 def get_local_time():
     return datetime.now(pytz.timezone('Asia/Calcutta'))
 
-def ensure_orders_csv_exists():
-    """Creates the orders.csv file with headers if it doesn't exist."""
-    if not os.path.exists(ORDERS_CSV):
-        try:
-            df = pd.DataFrame(columns=[
-                "Date", "Time", "OrderID", "CustomerName", "Phone", "Email",
-                "Address", "Items", "Subtotal", "DeliveryChargeAmount", "GST",
-                "PaymentMethod", "Discount", "razorpay_fee", "GrandTotal"
-            ])
-            df.to_csv(ORDERS_CSV, index=False, mode='w')
-        except Exception as e:
-            st.error(f"Failed to create {ORDERS_CSV}: {e}")
-
 def clean_text(txt):
     if not txt:
         return "-"
     return str(txt).replace("\n", " ").replace("\r", " ")
 
 
-def ensure_orders_dir():
-    if not os.path.exists(ORDERS_DIR):
-        os.makedirs(ORDERS_DIR, exist_ok=True)
-
-
-def today_orders_path():
-    ensure_orders_dir()
-    return os.path.join(ORDERS_DIR, f"Orders_{get_local_time().strftime('%Y-%m-%d')}.xlsx")
+def today_iso() -> str:
+    return get_local_time().strftime('%Y-%m-%d')
 
 
 def only_digits(s: str) -> str:
@@ -424,33 +423,36 @@ def create_default_menu():
 
 def load_menu(uploaded_file=None):
     try:
-        source = None
-        if uploaded_file:
-            source = uploaded_file
-        elif os.path.exists(MENU_EXCEL):
-            source = MENU_EXCEL
-        else:
+        if not uploaded_file and not os.path.exists(MENU_EXCEL):
             create_default_menu()
-            source = MENU_EXCEL
-
-        df = pd.read_excel(source, engine="openpyxl")
-
-        for col in ["Item", "Half", "Full", "Image"]:
-            if col not in df.columns:
-                raise ValueError("Excel must have 'Item', 'Half', 'Full' and 'Image' columns")
-        df["Half"] = pd.to_numeric(df["Half"], errors="coerce").fillna(0)
-        df["Full"] = pd.to_numeric(df["Full"], errors="coerce").fillna(0)
-        df["Item"] = df["Item"].fillna("").astype(str)
-        df["Image"] = df["Image"].fillna("").astype(str)
-        return df
+        return read_menu(MENU_EXCEL, uploaded_file or None)
     except Exception as e:
         st.error(f"Error loading menu: {e}")
         return pd.DataFrame(columns=["Item", "Half", "Full", "Image"])
 
 
+def load_menu_index(uploaded_file=None):
+    try:
+        return read_menu_index(MENU_EXCEL, uploaded_file or None)
+    except Exception:
+        # load_menu() has already reported the error
+        return {}
+
+
+def load_image_manifest(uploaded_file=None):
+    try:
+        return read_image_manifest(MENU_EXCEL, uploaded_file or None)
+    except Exception:
+        return {}
+
+
 def save_menu(df):
     try:
-        df.to_excel(MENU_EXCEL, index=False, engine="openpyxl")
+        write_menu(MENU_EXCEL, df)
+        # The reload resolves the new Image entries (and starts their thumbnails) once
+        missing = missing_images(load_image_manifest())
+        if missing:
+            st.session_state["missing_images_notice"] = missing
         return True
     except Exception as e:
         st.error(f"Failed to save menu: {e}")
@@ -460,151 +462,121 @@ def save_menu(df):
 def add_to_bill(item, price, size, quantity=1):
     st.session_state["last_activity"] = time.time()
     st.session_state["order_finalized_time"] = None
-    # Check if item with same size already exists
-    for bill_item in st.session_state["bill"]:
-        if bill_item['item'] == item and bill_item['size'] == size:
-            bill_item['quantity'] += quantity
-            st.session_state["total"] += float(price) * quantity
-            st.rerun()
-
-    st.session_state["bill"].append({"item": str(item), "price": float(price), "size": str(size), "quantity": quantity})
-    st.session_state["total"] += float(price) * quantity
+    # Same item and size are merged into one line
+    st.session_state["bill"].add(item, price, size, quantity)
     st.rerun()
 
 
+def bill_totals(payment_method=None):
+    """Totals for the current bill with the admin's billing settings (memoized by the Bill)."""
+    return st.session_state["bill"].totals(
+        delivery_charge_rate=float(st.session_state.get("delivery_charge_rate", 0.0)),
+        gst_rate=float(st.session_state.get("gst_rate", 0.0)),
+        discount=float(st.session_state.get("discount", 0.0)),
+        payment_method=payment_method,
+    )
+
+
+def cancel_payment_links(order_id: str):
+    """Cancel the order's unpaid Razorpay links so they can't be paid after the bill is gone."""
+    if razorpay_client and order_id:
+        get_payment_link_manager(razorpay_client).cancel_superseded(order_id)
+
+
 def clear_bill():
-    st.session_state["bill"] = []
-    st.session_state["total"] = 0.0
+    # An order finalized with Razorpay keeps its link: the reconciler still confirms a late payment
+    if not (st.session_state.get("order_finalized_time") and st.session_state.get("payment_method") == "Razorpay"):
+        cancel_payment_links(st.session_state.get("order_id"))
+    st.session_state["bill"] = Bill()
     st.session_state["cust_name"] = ""
     st.session_state["cust_phone"] = ""
     st.session_state["cust_addr"] = ""
     st.session_state["cust_email"] = ""
     st.session_state["payment_option"] = None
+    st.session_state["order_id"] = None
+    st.session_state["pickup_from"] = None
+    st.session_state["pickup_time"] = None
     st.session_state["last_activity"] = time.time()
     st.session_state["order_finalized_time"] = None
 
 
+def format_pickup(ts: float) -> str:
+    ready = datetime.fromtimestamp(ts, pytz.timezone('Asia/Calcutta'))
+    return ready.strftime("%I:%M %p" if ready.date() == get_local_time().date() else "%d %b %I:%M %p")
+
+
+def bill_prep():
+    """(prep-minutes, longest item) for the current bill, weighted by each item's menu category."""
+    categories = {m.name: m.category for items in menu_index.values() for m in items}
+    return order_prep(st.session_state["bill"], categories)
+
+
+def reserve_pickup(order_id: str):
+    """Commit the order to the kitchen's slot table; a slot taken meanwhile defers it to the next free one."""
+    if st.session_state.get("pickup_from") is None:
+        return
+    weight, _ = bill_prep()
+    st.session_state["pickup_time"] = pickup_scheduler.reserve(order_id, weight, st.session_state["pickup_from"])
+
+
+def receipt_data(order_id: str, totals=None) -> dict:
+    """Plain receipt values for the layout engine (PDF, ESC/POS and WhatsApp text)."""
+    totals = totals or bill_totals(st.session_state.get("payment_method"))
+    return {
+        "order_id": order_id,
+        "bill_time": get_local_time().strftime("%d %b %Y %H:%M:%S"),
+        "customer": clean_text(st.session_state["cust_name"]),
+        "phone": clean_text(st.session_state["cust_phone"]),
+        "email": clean_text(st.session_state["cust_email"]),
+        "address": clean_text(st.session_state["cust_addr"]),
+        "payment_method": st.session_state.get("payment_method", "N/A"),
+        "pickup_time": format_pickup(st.session_state["pickup_time"]) if st.session_state.get("pickup_time") else None,
+        "lines": [
+            {
+                "quantity": row["quantity"],
+                "item": clean_text(row["item"]),
+                "size": clean_text(row["size"]),
+                "amount": row["price"] * row["quantity"],
+            }
+            for row in st.session_state["bill"]
+        ],
+        "totals": {
+            "subtotal": totals.subtotal,
+            "delivery_charge": totals.delivery_charge,
+            "gst_rate": totals.gst_rate,
+            "gst_amount": totals.gst_amount,
+            "razorpay_fee": totals.razorpay_fee,
+            "discount": totals.discount,
+            "grand_total": totals.grand_total,
+        },
+    }
+
+
 def build_pdf_receipt(order_id: str) -> BytesIO | None:
     if canvas is None or MM is None:
         st.error("ReportLab is not installed. Please run: pip install reportlab")
         return None
 
-    # --- FONT SETUP FOR RUPEE SYMBOL ---
-    FONT_NAME = 'Helvetica'
-    FONT_NAME_BOLD = 'Helvetica-Bold'
+    _, _, font_error = receipt_fonts()
+    if font_error:
+        st.warning(f"Could not load a font that supports the Rupee symbol (₹). Please add 'DejaVuSans.ttf' to the app directory. Error: {font_error}")
+
+    # Rendered once per order and bill contents; reruns and the email sends reuse the bytes
+    return BytesIO(receipt_pdf_bytes(receipt_data(order_id)))
+
+
+def print_receipt(order_id: str) -> bool:
+    """Send the receipt as raw ESC/POS to the counter printer (RECEIPT_PRINTER: host:port or device path)."""
     try:
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
-        font_path = os.path.join(APP_DIR, "DejaVuSans.ttf")
-        pdfmetrics.registerFont(TTFont('DejaVuSans', font_path))
-        FONT_NAME = 'DejaVuSans'
-        FONT_NAME_BOLD = 'DejaVuSans'  # Using regular for bold as well, as bold version might not be available
+        send_to_printer(render_escpos(build_receipt_layout(receipt_data(order_id))), RECEIPT_PRINTER)
+        return True
     except Exception as e:
-        st.warning(f"Could not load a font that supports the Rupee symbol (₹). Please add 'DejaVuSans.ttf' to the app directory. Error: {e}")
-    # --- END FONT SETUP ---
-
-    lines = max(1, len(st.session_state["bill"]))
-    thermal_width = 80 * MM
-    thermal_height = (70 + 8 * lines + 40) * MM
-
-    buf = BytesIO()
-    c = canvas.Canvas(buf, pagesize=(thermal_width, thermal_height))
-
-    y = thermal_height - 10
-    c.drawImage(LOGO_PATH, 2 * MM, y - 5 * MM, width=20 * MM, height=10 * MM)
-    c.drawImage(LOGO_PATH, thermal_width - 22 * MM, y - 5 * MM, width=20 * MM, height=10 * MM)
-    y -= 12
-    c.setFont(FONT_NAME_BOLD, 10)
-    c.drawCentredString(thermal_width / 2, y, "Dhaliwals Food Court")
-    y -= 5
-    c.setFont(FONT_NAME, 4)
-    c.drawCentredString(thermal_width / 2, y, "Unit of Param Mehar Enterprise Prop Pushpinder Singh Dhaliwal")
-    y -= 7
-    c.setFont(FONT_NAME, 4)
-    c.drawCentredString(thermal_width / 2, y, "Meerut, UP | Ph: +91-9259317713")
-    y -= 10
-    c.line(0, y, thermal_width, y)
-
-    y -= 12
-    now_str = get_local_time().strftime("%d %b %Y %H:%M:%S")
-    c.setFont(FONT_NAME, 8)
-    c.drawString(2, y, f"Bill Time: {now_str}")
-    y -= 10
-    c.drawString(2, y, f"Order ID: {order_id}")
-    y -= 10
-    c.drawString(2, y, f"Customer: {clean_text(st.session_state['cust_name'])}")
-    y -= 10
-    c.drawString(2, y, f"Phone: {clean_text(st.session_state['cust_phone'])}")
-    y -= 10
-    c.drawString(2, y, f"Email: {clean_text(st.session_state['cust_email'])}")
-    y -= 10
-    c.drawString(2, y, f"Address: {clean_text(st.session_state['cust_addr'])}")
-    y -= 10
-    c.drawString(2, y, f"Payment Method: {st.session_state.get('payment_method', 'N/A')}")
-
-    y -= 10
-    c.line(0, y, thermal_width, y)
-    y -= 12
-
-    c.setFont(FONT_NAME_BOLD, 8)
-    c.drawString(2, y, "Item")
-    c.drawRightString(thermal_width - 2, y, "Price")
-
-    y -= 10
-    c.setFont(FONT_NAME, 8)
-    subtotal = 0.0
-    for row in st.session_state["bill"]:
-        item_line = clean_text(f"{row['quantity']}x {row['item']} ({row['size']})")
-        price_str = f"₹{row['price'] * row['quantity']:.2f}"
-        c.drawString(2, y, item_line[:28])
-        c.drawRightString(thermal_width - 2, y, price_str)
-        y -= 10
-        subtotal += float(row["price"]) * row['quantity']
-
-    delivery_charge_rate = float(st.session_state.get("delivery_charge_rate", 0.0))
-    gst_rate = float(st.session_state.get("gst_rate", 0.0))
-    discount = float(st.session_state["discount"])
-    delivery_charge = subtotal * delivery_charge_rate / 100.0
-    gst_amount = subtotal * gst_rate / 100.0
-    razorpay_fee = 0.0
-    if st.session_state.get("payment_method") == "Razorpay":
-        razorpay_fee = subtotal * 0.026
-    grand_total = subtotal + delivery_charge + gst_amount - discount + razorpay_fee
-
-    c.line(0, y, thermal_width, y)
-    y -= 12
-    c.setFont(FONT_NAME_BOLD, 8)
-    c.drawString(2, y, "Subtotal")
-    c.drawRightString(thermal_width - 2, y, f"₹{subtotal:.2f}")
-    y -= 10
-    c.drawString(2, y, "Delivery Charge")
-    c.drawRightString(thermal_width - 2, y, f"₹{delivery_charge:.2f}")
-    y -= 10
-    c.drawString(2, y, f"GST ({gst_rate}%)")
-    c.drawRightString(thermal_width - 2, y, f"₹{gst_amount:.2f}")
-    y -= 10
-    if razorpay_fee > 0:
-        c.drawString(2, y, "Razorpay Fee")
-        c.drawRightString(thermal_width - 2, y, f"₹{razorpay_fee:.2f}")
-        y -= 10
-    c.drawString(2, y, "Discount")
-    c.drawRightString(thermal_width - 2, y, f"-₹{discount:.2f}")
-    y -= 10
-    c.drawString(2, y, "Grand Total")
-    c.drawRightString(thermal_width - 2, y, f"₹{grand_total:.2f}")
-
-    y -= 14
-    c.setFont("Helvetica-Oblique", 8)
-    c.drawCentredString(thermal_width / 2, y, "Thank you for visiting!")
-
-    c.showPage()
-    c.save()
-    buf.seek(0)
-    return buf
-def save_order_log(order_id: str, subtotal: float, delivery_charge: float, gst_amount: float, discount: float, grand_total: float, payment_method: str, razorpay_fee: float = 0.0):
-    """Logs order to the daily Excel file AND appends to consolidated orders.csv"""
-    ensure_orders_dir()
-    path = today_orders_path()
+        st.warning(f"Could not print receipt on {RECEIPT_PRINTER}: {e}")
+        return False
+
+
+def save_order_log(order_id: str, totals, payment_method: str):
+    """Records the order in the SQLite order store (orders.csv / daily Excel are exports of it)"""
     now = get_local_time()
     row = {
         "Date": now.strftime("%d-%m-%Y"),
@@ -615,39 +587,26 @@ def save_order_log(order_id: str, subtotal: float, delivery_charge: float, gst_a
         "Email": st.session_state["cust_email"],
         "Address": st.session_state["cust_addr"],
         "Items": "; ".join([f"{i['quantity']}x {i['item']}({i['size']})-₹{i['price']:.2f}" for i in st.session_state["bill"]]),
-        "Subtotal": subtotal,
-        "DeliveryChargeAmount": delivery_charge,
-        "GST": gst_amount,
+        "Subtotal": totals.subtotal,
+        "DeliveryChargeAmount": totals.delivery_charge,
+        "GST": totals.gst_amount,
         "PaymentMethod": payment_method,
-        "Discount": discount,
-        "razorpay_fee": razorpay_fee,
-        "GrandTotal": grand_total,
+        "Discount": totals.discount,
+        "razorpay_fee": totals.razorpay_fee,
+        "GrandTotal": totals.grand_total,
+        "Lines": list(st.session_state["bill"]),
     }
+    reserve_pickup(order_id)
 
-    # Save to daily Excel
-    try:
-        if os.path.exists(path):
-            df = pd.read_excel(path, engine="openpyxl")
-            df = pd.concat([df, pd.DataFrame([row])], ignore_index=True)
-        else:
-            df = pd.DataFrame([row])
-        df.to_excel(path, index=False, engine="openpyxl")
-    except Exception as e:
-        st.warning(f"Could not log order to Excel ({path}): {e}")
+    # Goes through the process-wide writer thread, so the UI never waits on disk
+    future = get_order_writer().submit([(order_store, row)])
+    future.add_done_callback(_report_order_log_error)
 
-    # Save to consolidated CSV
-    try:
-        # Convert the row dictionary to a DataFrame
-        df_new_row = pd.DataFrame([row])
-        
-        # Check if the file exists to decide whether to write headers
-        header = not os.path.exists(ORDERS_CSV)
-        
-        # Append to the CSV file
-        df_new_row.to_csv(ORDERS_CSV, mode='a', header=header, index=False)
-        
-    except Exception as e:
-        st.warning(f"Could not log order to CSV ({ORDERS_CSV}): {e}")
+
+def _report_order_log_error(future):
+    # Runs on the writer thread, where st.* calls are not available
+    if future.exception() is not None:
+        print(f"ERROR: Could not log order: {future.exception()}")
 
 
 # ==== Messaging helpers (email + WhatsApp) ====
@@ -681,14 +640,14 @@ def send_email_with_pdf(to_email: str, pdf_bytes: bytes, order_id: str) -> bool:
         part["Content-Disposition"] = f'attachment; filename="receipt_{order_id}.pdf"'
         msg.attach(part)
 
-        server = smtplib.SMTP(st.session_state["smtp_server"], st.session_state["smtp_port"], timeout=20)
-        server.starttls()
-        server.login(st.session_state["sender_email"], st.session_state["sender_password"])
-        server.sendmail(st.session_state["sender_email"], recipients, msg.as_string())
-        server.quit()
+        # Delivered by the outbox worker; the page doesn't wait on SMTP
+        get_outbox().enqueue(
+            "customer_receipt", st.session_state["sender_email"], recipients, msg.as_bytes(),
+            meta={"order_id": order_id, "to": to_email},
+        )
         return True
     except Exception as e:
-        st.error(f"Failed to send email: {e}")
+        st.error(f"Failed to queue email: {e}")
         return False
 
 
@@ -701,6 +660,27 @@ def send_email_to_owner(pdf_bytes: bytes, order_id: str) -> bool:
         st.error("Sender email password is missing.")
         return False
 
+    outbox = get_outbox()
+    if outbox.digest_enabled:
+        # Coalesced into the next owner digest; reuses the receipt PDF bytes as-is
+        try:
+            totals = bill_totals(st.session_state.get("payment_method"))
+            outbox.hold_for_digest(
+                st.session_state["sender_email"], owner_email, pdf_bytes,
+                meta={
+                    "order_id": order_id,
+                    "time": get_local_time().strftime("%H:%M"),
+                    "customer": st.session_state["cust_name"],
+                    "phone": st.session_state["cust_phone"],
+                    "payment_method": st.session_state.get("payment_method", ""),
+                    "grand_total": totals.grand_total,
+                },
+            )
+            return True
+        except Exception as e:
+            st.error(f"Failed to queue email to owner: {e}")
+            return False
+
     try:
         msg = MIMEMultipart()
         msg["From"] = st.session_state["sender_email"]
@@ -723,71 +703,140 @@ def send_email_to_owner(pdf_bytes: bytes, order_id: str) -> bool:
         part["Content-Disposition"] = f'attachment; filename="receipt_{order_id}.pdf"'
         msg.attach(part)
 
-        server = smtplib.SMTP(st.session_state["smtp_server"], st.session_state["smtp_port"], timeout=20)
-        server.starttls()
-        server.login(st.session_state["sender_email"], st.session_state["sender_password"])
-        server.sendmail(st.session_state["sender_email"], owner_email, msg.as_string())
-        server.quit()
+        outbox.enqueue(
+            "owner_order", st.session_state["sender_email"], [owner_email], msg.as_bytes(),
+            meta={"order_id": order_id, "to": owner_email},
+        )
         return True
     except Exception as e:
-        st.error(f"Failed to send email to owner: {e}")
-        return False
-
-
-def send_whatsapp_message(to_number_raw: str, order_id: str, subtotal: float, delivery_charge: float, gst_amount: float, grand_total: float, razorpay_fee: float = 0.0) -> bool:
-    to_digits = "".join([c for c in str(to_number_raw) if c.isdigit()])
-    if not to_digits:
-        st.error("Invalid customer phone for WhatsApp.")
+        st.error(f"Failed to queue email to owner: {e}")
         return False
 
-    items_str = "\n".join([
-        f"- {i['quantity']}x {i['item']} ({i['size']}): ₹{i['price'] * i['quantity']:.2f}"
-        for i in st.session_state["bill"]
-    ])
 
+def build_whatsapp_message(order_id: str, totals) -> str:
     customer_name = st.session_state.get("cust_name", "").strip()
     cust_name_str = f"Hello {customer_name},\n\n" if customer_name else ""
+    layout = build_receipt_layout(receipt_data(order_id, totals))
 
-    razorpay_fee_str = f"*Razorpay Fee:* ₹{razorpay_fee:.2f}\n" if razorpay_fee > 0 else ""
-    gst_rate = float(st.session_state.get("gst_rate", 0.0))
-
-    message = (
+    return (
         f"{cust_name_str}Thank you for your order from Dhaliwals Food Court!\n\n"
-        f"*Order ID:* {order_id}\n"
-        f"*Date:* {get_local_time().strftime('%d %b %Y %H:%M')}\n\n"
-        f"*Items:*\n{items_str}\n\n"
-        f"*Subtotal:* ₹{subtotal:.2f}\n"
-        f"*Delivery Charge:* ₹{delivery_charge:.2f}\n"
-        f"*GST ({gst_rate}%):* ₹{gst_amount:.2f}\n"
-        f"{razorpay_fee_str}"
-        f"*Grand Total:* ₹{grand_total:.2f}\n\n"
+        f"{render_text(layout, sections=('order', 'items', 'totals'))}\n\n"
         f"We hope you enjoy your meal!"
     )
 
+
+def send_whatsapp_message(to_number_raw: str, order_id: str, totals) -> bool:
+    to_digits = "".join([c for c in str(to_number_raw) if c.isdigit()])
+    if not to_digits:
+        st.error("Invalid customer phone for WhatsApp.")
+        return False
+
+    message = build_whatsapp_message(order_id, totals)
+
     url = f"https://wa.me/{to_digits}?text={urllib.parse.quote(message)}"
     st.markdown(f'<a href="{url}" target="_blank">Click here to send WhatsApp message</a>', unsafe_allow_html=True)
     return True
 
 
+# ==== Menu grid rendering ====
+
+MISSING_IMAGE_HTML = (
+    '<div style="width:150px;height:110px;display:flex;align-items:center;justify-content:center;'
+    'background:#f2f2f2;color:#999;border-radius:6px;font-size:13px;">🍽️ Photo coming soon</div>'
+)
+
+def render_menu_item(menu_item, unique_key: str):
+    item = menu_item.name
+    half_price = menu_item.half
+    full_price = menu_item.full
+    image = menu_item.image_ref
+
+    # --- ITEM IMAGE ---  (resolved once per menu version by menu_store)
+    if image.kind == "file":
+        st.image(cached_thumbnail(image.src, image.mtime_ns) or image.src, width=150)
+    elif image.kind == "url":
+        st.image(image.src, width=150)
+    elif image.kind == "missing":
+        st.markdown(MISSING_IMAGE_HTML, unsafe_allow_html=True)
+
+    # --- ITEM NAME ---
+    st.markdown(f"**{item}**")
+
+    # --- QUANTITY SELECTOR ---
+    qty = st.number_input(
+        "Qty",
+        min_value=1,
+        max_value=10,
+        value=1,
+        step=1,
+        key=f"qty_{unique_key}"
+    )
+
+    # --- ADD BUTTONS ---
+    if half_price > 0:
+        c_btn1, c_btn2 = st.columns(2)
+        with c_btn1:
+            if st.button(f"Half ₹{half_price}", key=f"half_{unique_key}"):
+                add_to_bill(item, half_price, "Half", qty)
+        with c_btn2:
+            if st.button(f"Full ₹{full_price}", key=f"full_{unique_key}"):
+                add_to_bill(item, full_price, "Full", qty)
+    else:
+        if st.button(f"Add ₹{full_price}", key=f"full_{unique_key}", use_container_width=True):
+            add_to_bill(item, full_price, "Full", qty)
+
+
+def render_menu_grid(menu_items, key_prefix: str = "", cols_per_row: int = 3):
+    """Render one page of MenuItem records; only these widgets are built on this rerun."""
+    if MENU_PAGE_SIZE and len(menu_items) > MENU_PAGE_SIZE:
+        page_count = math.ceil(len(menu_items) / MENU_PAGE_SIZE)
+        page = st.radio(
+            "Page",
+            range(1, page_count + 1),
+            horizontal=True,
+            key=f"menu_page_{key_prefix or menu_items[0].category}_{page_count}",
+        )
+        start = (page - 1) * MENU_PAGE_SIZE
+        menu_items = menu_items[start:start + MENU_PAGE_SIZE]
+
+    for i in range(0, len(menu_items), cols_per_row):
+        cols = st.columns(cols_per_row)
+        for menu_item, col in zip(menu_items[i:i + cols_per_row], cols):
+            with col:
+                render_menu_item(menu_item, f"{key_prefix}{menu_item.key}")
+
+
 # =========================
 # APP LAYOUT
 # =========================
 # Auto-clear logic
-# 1. After 1 minute of finalizing an order
-if st.session_state.get("order_finalized_time") and (time.time() - st.session_state["order_finalized_time"] > 60):
+# 1. After FINALIZED_CLEAR_SECONDS of finalizing an order
+if st.session_state.get("order_finalized_time") and (time.time() - st.session_state["order_finalized_time"] > FINALIZED_CLEAR_SECONDS):
     clear_bill()
     st.toast("Auto-clearing for next order.")
     time.sleep(1)
     st.rerun()
-# 2. After 2 minutes of inactivity before finalizing
-elif not st.session_state.get("order_finalized_time") and 'last_activity' in st.session_state and (time.time() - st.session_state["last_activity"] > 900):
+# 2. After INACTIVITY_CLEAR_SECONDS of inactivity before finalizing
+elif not st.session_state.get("order_finalized_time") and 'last_activity' in st.session_state and (time.time() - st.session_state["last_activity"] > INACTIVITY_CLEAR_SECONDS):
     clear_bill()
     st.toast("Bill cleared due to inactivity.")
     time.sleep(1)
     st.rerun()
 
-ensure_orders_csv_exists()
+order_store = get_order_store(legacy_csv=ORDERS_CSV)
+payment_reconciler = None
+if razorpay_client:
+    # Confirms Razorpay payments in the background (polling, plus webhooks if configured)
+    payment_reconciler = get_payment_reconciler(
+        razorpay_client,
+        order_store,
+        get_payment_link_manager(razorpay_client),
+        webhook_port=int(get_secret("RAZORPAY_WEBHOOK_PORT", "0") or 0),
+        webhook_secret=get_secret("RAZORPAY_WEBHOOK_SECRET", ""),
+    )
 menu_df = load_menu(st.session_state["uploaded_menu_file"])
+menu_index = load_menu_index(st.session_state["uploaded_menu_file"])
+image_manifest = load_image_manifest(st.session_state["uploaded_menu_file"])
 
 
 # Top Header (Dhaliwals Food Court Unit of Param Mehar Enterprise Prop Pushpinder Singh Dhaliwal)
@@ -810,68 +859,12 @@ SENDER_EMAIL = st.secrets["SENDER_EMAIL"]
 SENDER_PASSWORD = st.secrets["SENDER_PASSWORD"]
 SEND_TIME = st.secrets.get("SEND_TIME", "23:30")   # HH:MM IST
 ORDERS_CSV = "orders.csv"
-LAST_RUN_FILE = "last_run_date.txt"
 
+# End-of-day report: sent from a background thread at SEND_TIME, exactly once per day
+report_scheduler = get_report_scheduler(SEND_TIME)
 
-
-# ======================================================
-# 📌 EMAIL SCHEDULER HELPER FUNCTIONS
-# ======================================================
-
-def send_end_of_day_orders():
-    """Send today's orders.csv to the owner via email."""
-    if not os.path.exists(ORDERS_CSV):
-        st.warning("orders.csv not found — skipping send.")
-        return False
-
-    try:
-        msg = MIMEMultipart()
-        msg["From"] = SENDER_EMAIL
-        msg["To"] = OWNER_EMAIL
-        msg["Subject"] = "End of Day Orders"
-        msg.attach(MIMEText("Today's orders are attached.", "plain"))
-
-        with open(ORDERS_CSV, "rb") as f:
-            part = MIMEBase("application", "octet-stream")
-            part.set_payload(f.read())
-            encoders.encode_base64(part)
-            part.add_header("Content-Disposition", "attachment; filename=orders.csv")
-            msg.attach(part)
-
-        server = smtplib.SMTP("smtp.gmail.com", 587)
-        server.starttls()
-        server.login(SENDER_EMAIL, SENDER_PASSWORD)
-        server.send_message(msg)
-        server.quit()
-        return True
-
-    except Exception as e:
-        st.error(f"Email send failed: {e}")
-        return False
-
-def get_server_utc_now():
-    return datetime.now(timezone.utc)
-
-def get_local_now(tz_name):
-    tz = pytz.timezone(tz_name)
-    utc_now = get_server_utc_now()
-    return utc_now.astimezone(tz)
-
-# Example usage
-local_now = get_local_now("Asia/Kolkata")
-
-def read_last_run_date():
-    if not os.path.exists(LAST_RUN_FILE):
-        return None
-    try:
-        with open(LAST_RUN_FILE, "r") as f:
-            return dt.date.fromisoformat(f.read().strip())
-    except:
-        return None
-
-def write_last_run_date(d: dt.date):
-    with open(LAST_RUN_FILE, "w") as f:
-        f.write(d.isoformat())
+# Kitchen capacity per pickup slot, in prep-minutes, shared by every session
+pickup_scheduler = get_pickup_scheduler(float(get_secret("PICKUP_SLOT_CAPACITY", SLOT_CAPACITY)))
 
 # ======================================================
 # 📌 ADMIN PANEL SIDEBAR
@@ -903,6 +896,23 @@ with st.sidebar:
             menu_df, num_rows="dynamic", use_container_width=True, key="menu_editor"
         )
 
+        stats = menu_cache_stats()
+        st.caption(f"Menu cache: {stats['hits']} hits / {stats['misses']} misses")
+        kinds = [ref.kind for ref in image_manifest.values()]
+        st.caption(
+            f"Menu images: {kinds.count('file')} local, {kinds.count('url')} remote, {kinds.count('missing')} missing"
+        )
+        missing = st.session_state.pop("missing_images_notice", None) or missing_images(image_manifest)
+        if missing:
+            st.warning("Image files not found (tiles show a placeholder): " + ", ".join(missing))
+        asset_stats = asset_manager.stats()
+        inline_bytes = sum(len(src) for src in (qr_app_src, qr_rev_src) if src.startswith("data:"))
+        st.caption(
+            f"Header assets: {asset_stats['assets']} files, {asset_stats['asset_bytes'] / 1024:.1f} KB"
+            f" | Inline per rerun: {inline_bytes / 1024:.1f} KB"
+            + ("" if STATIC_SERVING else " (enable server.enableStaticServing to serve them by URL)")
+        )
+
         if st.button("Save Menu Changes"):
             if save_menu(edited_df):
                 st.success("Menu saved successfully!")
@@ -948,6 +958,25 @@ with st.sidebar:
 
         st.divider()
 
+        # -----------------------
+        # KITCHEN LOAD
+        # -----------------------
+        st.subheader("Kitchen Load")
+        capacity = st.number_input(
+            f"Prep-minutes per {SLOT_MINUTES}-minute pickup slot",
+            min_value=1.0,
+            value=float(pickup_scheduler.capacity),
+            step=5.0,
+        )
+        if capacity != pickup_scheduler.capacity:
+            pickup_scheduler.capacity = capacity
+        st.caption("Next slots (prep-minutes booked / capacity, orders): " + " | ".join(
+            f"{format_pickup(ready)}: {load:.0f}/{capacity:.0f} ({count})"
+            for ready, load, count in pickup_scheduler.upcoming()
+        ))
+
+        st.divider()
+
         # -----------------------
         # OWNER SETTINGS
         # -----------------------
@@ -979,6 +1008,13 @@ with st.sidebar:
                     st.session_state["smtp_port"] = st.session_state["smtp_port_input"]
                     st.session_state["sender_email"] = st.session_state["sender_email_input"]
                     st.session_state["sender_password"] = st.session_state["sender_password_input"]
+                    # The outbox worker is shared by every session: only an admin save changes its account
+                    get_outbox().configure_smtp(
+                        st.session_state["smtp_server"],
+                        st.session_state["smtp_port"],
+                        st.session_state["sender_email"],
+                        st.session_state["sender_password"],
+                    )
 
                     st.session_state["edit_smtp"] = False
                     st.success("SMTP settings updated.")
@@ -1008,22 +1044,133 @@ with st.sidebar:
         # -----------------------
         st.subheader("Orders Export")
 
-        if os.path.exists(ORDERS_CSV):
-            with open(ORDERS_CSV, "rb") as f:
-                st.download_button("Download Orders (CSV)", f, file_name="orders.csv")
-        else:
-            st.info("No orders yet.")
+        # Exports are generated from the order store only on request
+        today = today_iso()
+        if st.button("Prepare Orders Export"):
+            try:
+                st.session_state["orders_export_csv"] = order_store.export_csv()
+                if order_store.count_orders(today):
+                    st.session_state["orders_export_xlsx"] = order_store.export_excel_bytes(today)
+            except Exception as e:
+                st.error(f"Could not export orders: {e}")
+
+        if st.session_state.get("orders_export_csv"):
+            st.download_button("Download Orders (CSV)", st.session_state["orders_export_csv"], file_name="orders.csv")
+        if st.session_state.get("orders_export_xlsx"):
+            st.download_button(
+                "Download Today's Orders (Excel)",
+                st.session_state["orders_export_xlsx"],
+                file_name=f"Orders_{today}.xlsx",
+            )
+        if not order_store.count_orders(today):
+            st.caption("Today's Excel log will appear after the first order is logged.")
 
-        today_file = today_orders_path()
-        if os.path.exists(today_file):
-            with open(today_file, "rb") as f:
-                st.download_button(
-                    "Download Today's Orders (Excel)",
-                    f,
-                    file_name=os.path.basename(today_file),
-                )
+        st.divider()
+
+        # -----------------------
+        # PAYMENTS
+        # -----------------------
+        st.subheader("Payments")
+        if payment_reconciler:
+            rec = payment_reconciler.status()
+            last_poll = (
+                datetime.fromtimestamp(rec["last_poll"], pytz.timezone("Asia/Kolkata")).strftime("%H:%M:%S")
+                if rec["last_poll"] else "never"
+            )
+            st.caption(f"Open Razorpay links: {rec['open_links']} | Last check: {last_poll} | Confirmed: {rec['confirmed']}")
+            if rec["last_error"]:
+                st.warning(f"Payment check failed: {rec['last_error']}")
+            if st.button("Check Payments Now"):
+                payment_reconciler.poke()
+        payments = order_store.payments_frame(today)
+        if len(payments):
+            st.dataframe(payments, hide_index=True)
         else:
-            st.caption("Today's Excel log will appear after the first order is logged.")
+            st.caption("No orders yet today.")
+
+        st.divider()
+
+        # -----------------------
+        # SALES
+        # -----------------------
+        st.subheader("Sales")
+        # From the rollup tables: constant time however long the order history gets
+        today_summary = order_store.day_summary(today)
+        st.caption(
+            f"Today so far: {today_summary['orders']} orders | ₹{today_summary['revenue']:,.2f}"
+            + "".join(f" | {method}: ₹{total:,.2f}" for method, _, total in today_summary["by_payment"])
+        )
+        hourly = order_store.hourly_totals(today)
+        if len(hourly):
+            st.bar_chart(hourly["revenue"])
+        if st.checkbox("Show sales report", key="show_sales"):
+            periods = {"Last 7 days": 7, "Last 30 days": 30, "Last 365 days": 365, "All time": None}
+            period = st.selectbox("Period", list(periods), index=1, key="sales_period")
+            days = periods[period]
+            start = get_local_time().date() - timedelta(days=days - 1) if days else None
+            categories = {m.search_name: m.category for items in menu_index.values() for m in items}
+            report = sales_report(order_store.orders_frame(), categories, start=start)
+
+            if report["orders"]:
+                st.metric("Revenue", f"₹{report['revenue']:,.2f}")
+                st.caption(f"Orders: {report['orders']} | Average ticket: ₹{report['avg_ticket']:.2f}")
+                st.markdown("**Revenue by day**")
+                st.bar_chart(report["by_day"]["revenue"])
+                st.markdown("**Revenue by hour**")
+                st.bar_chart(report["by_hour"]["revenue"])
+                st.markdown("**By payment method**")
+                st.dataframe(report["by_payment"])
+                st.markdown("**By category**")
+                st.dataframe(report["by_category"])
+                st.markdown("**Top items**")
+                st.dataframe(report["top_items"])
+                if report["legacy_lines"]:
+                    st.caption(f"{report['legacy_lines']} items from free-text orders are valued by sharing out the order total.")
+            else:
+                st.caption("No orders in this period.")
+
+        st.divider()
+
+        # -----------------------
+        # EMAIL OUTBOX
+        # -----------------------
+        st.subheader("Email Outbox")
+        outbox = get_outbox()
+        counts = outbox.status_counts()
+        st.caption(
+            f"Pending: {counts.get('pending', 0)} | Sent: {counts.get('sent', 0)} | Failed: {counts.get('dead', 0)}"
+            f" | Held for digest: {counts.get('held', 0)}"
+        )
+
+        digest_on = st.checkbox("Batch owner order emails into a digest", value=outbox.digest_enabled)
+        if digest_on:
+            digest_minutes = st.number_input(
+                "Digest window (minutes)", min_value=1, value=int(outbox.digest_minutes or 5), step=1
+            )
+            digest_orders = st.number_input(
+                "...or send after this many orders", min_value=1, value=outbox.digest_max_orders, step=1
+            )
+            if (digest_minutes, digest_orders) != (outbox.digest_minutes, outbox.digest_max_orders):
+                outbox.configure_digest(digest_minutes, digest_orders)
+        elif outbox.digest_enabled:
+            outbox.configure_digest(0, outbox.digest_max_orders)
+        dead = outbox.dead_letters()
+        if dead:
+            st.dataframe(
+                pd.DataFrame([
+                    {
+                        "Order": json.loads(job["meta"] or "{}").get("order_id", ""),
+                        "Type": job["kind"],
+                        "To": ", ".join(json.loads(job["recipients"])),
+                        "Attempts": job["attempts"],
+                        "Error": job["last_error"],
+                    }
+                    for job in dead
+                ]),
+                hide_index=True,
+            )
+            if st.button("Retry Failed Emails"):
+                st.success(f"{outbox.retry_dead()} email(s) re-queued.")
 
         st.divider()
 
@@ -1035,8 +1182,10 @@ with st.sidebar:
         # Manual Send Button
         if st.button("Send Orders Email Now"):
             try:
-                send_daily_orders_email()
-                st.success("Email sent successfully!")
+                if send_daily_orders_email(today_iso()):
+                    st.success("Today's report sent successfully!")
+                else:
+                    st.error("Report was not sent; check the server log.")
             except Exception as e:
                 st.error(f"Error sending email: {e}")
 
@@ -1045,26 +1194,23 @@ with st.sidebar:
         # -----------------------
         st.subheader("Daily Email Automation")
 
-        local_now = get_local_now("Asia/Kolkata")
-        st.write("Local time:", local_now.strftime("%Y-%m-%d %H:%M:%S"))
-
-        send_hour, send_minute = map(int, SEND_TIME.split(":"))
-        send_time_today = local_now.replace(hour=send_hour, minute=send_minute, second=0)
-
-        last_run = read_last_run_date()
-        today = local_now.date()
-
-        if local_now >= send_time_today and last_run != today:
-            st.info(f"Time reached ({SEND_TIME}). Sending email…")
-            success = send_end_of_day_orders()
-            if success:
-                write_last_run_date(today)
-                st.success("Email sent!")
-        else:
-            if last_run == today:
-                st.write("Email already sent today.")
+        report_status = report_scheduler.status()
+        st.write("Local time:", get_local_time().strftime("%Y-%m-%d %H:%M:%S"))
+        st.caption(
+            f"Scheduled daily at {SEND_TIME} IST"
+            f" | Last report sent for: {report_status['last_sent'] or 'never'}"
+            + (f" | Next run: {report_status['next_run']:%Y-%m-%d %H:%M}" if report_status["next_run"] else "")
+        )
+        if not report_status["running"]:
+            st.warning("Report scheduler is not running.")
+        if report_status["last_error"]:
+            st.error(f"Last attempt failed: {report_status['last_error']}")
+        if st.button("Send Missed Reports Now"):
+            sent_days = report_scheduler.run_due()
+            if sent_days:
+                st.success("Sent report for " + ", ".join(d.isoformat() for d in sent_days))
             else:
-                st.write(f"Waiting for {SEND_TIME}…")
+                st.info("No report is due.")
     # WRONG PASSWORD
     elif password:
         st.error("Incorrect password")
@@ -1101,75 +1247,28 @@ with col1:
         menu_df["Category"] = "Fast Food"  # Default if missing
 
     if not menu_df.empty:
-        # 1. Create Tabs for your categories
-        tabs = st.tabs(["Fast Food", "Drinks", "Bakery", "Snacks"])
-        
-        # 2. Map the Tabs to the exact text in your Excel 'Category' column
-        #    (Make sure these match what you type in Excel/Admin Panel)
-        categories_map = {
-            "Fast Food": "Fast Food",
-            "Drinks": "Drinks",
-            "Bakery": "Bakery",
-            "Snacks": "Snacks"
-        }
+        # Only the selected category (or the search results) is materialized per rerun;
+        # other categories are built on demand when the customer switches to them.
+        search = st.text_input("🔍 Search menu", key="menu_search", placeholder="e.g. Paneer, Pizza, Frooti").strip()
+
+        if search:
+            needle = search.lower()
+            matches = [m for items in menu_index.values() for m in items if needle in m.search_name]
+            if not matches:
+                st.info(f"No items match '{search}'.")
+            else:
+                render_menu_grid(matches, "search_")
+        else:
+            category_name = st.radio(
+                "Category", MENU_CATEGORIES, horizontal=True, key="menu_category", label_visibility="collapsed"
+            )
+            # Match the exact text in the Excel 'Category' column
+            menu_items = menu_index.get(category_name, ())
 
-        # 3. Loop through each tab and display items
-        for tab, category_name in zip(tabs, categories_map.keys()):
-            with tab:
-                # Filter the menu for this specific category
-                category_df = menu_df[menu_df["Category"] == category_name]
-                
-                if category_df.empty:
-                    st.info(f"No items in {category_name} yet.")
-                else:
-                    # Display items in a grid (3 items per row)
-                    cols_per_row = 3
-                    for i in range(0, len(category_df), cols_per_row):
-                        cols = st.columns(cols_per_row)
-                        for idx, col in enumerate(cols):
-                            if i + idx < len(category_df):
-                                row = category_df.iloc[i + idx]
-                                item = row["Item"]
-                                half_price = row["Half"]
-                                full_price = row["Full"]
-                                image_path = str(row["Image"]).strip() if pd.notna(row["Image"]) else None
-
-                                with col:
-                                    # --- ITEM IMAGE ---
-                                    if image_path and os.path.exists(image_path):
-                                        st.image(image_path, width=150)
-                                    elif image_path and image_path.startswith("http"):
-                                        st.image(image_path, width=150)
-
-                                    # --- ITEM NAME ---
-                                    st.markdown(f"**{item}**")
-
-                                    # --- UNIQUE KEY GENERATION ---
-                                    # Crucial: Creates a unique ID for buttons so they don't clash across tabs
-                                    unique_key = f"{category_name}_{item}_{i+idx}"
-
-                                    # --- QUANTITY SELECTOR ---
-                                    qty = st.number_input(
-                                        "Qty", 
-                                        min_value=1, 
-                                        max_value=10, 
-                                        value=1, 
-                                        step=1, 
-                                        key=f"qty_{unique_key}"
-                                    )
-
-                                    # --- ADD BUTTONS ---
-                                    if half_price > 0:
-                                        c_btn1, c_btn2 = st.columns(2)
-                                        with c_btn1:
-                                            if st.button(f"Half ₹{half_price}", key=f"half_{unique_key}"):
-                                                add_to_bill(item, half_price, "Half", qty)
-                                        with c_btn2:
-                                            if st.button(f"Full ₹{full_price}", key=f"full_{unique_key}"):
-                                                add_to_bill(item, full_price, "Full", qty)
-                                    else:
-                                        if st.button(f"Add ₹{full_price}", key=f"full_{unique_key}", use_container_width=True):
-                                            add_to_bill(item, full_price, "Full", qty)
+            if not menu_items:
+                st.info(f"No items in {category_name} yet.")
+            else:
+                render_menu_grid(menu_items)
     else:
         st.warning("Menu is empty. Please add items via Admin Panel.")
 
@@ -1186,13 +1285,12 @@ with col2:
             with col3:
                 if st.button("🗑️", key=f"delete_{i}"):
                     st.session_state["last_activity"] = time.time()
-                    removed_item = st.session_state["bill"].pop(i)
-                    st.session_state["total"] -= removed_item['price'] * removed_item['quantity']
+                    st.session_state["bill"].remove(bill_item['item'], bill_item['size'])
                     st.rerun()
                             
         st.markdown("---")
         st.markdown(
-    f'<div class="total-amount">Total: ₹{st.session_state["total"]:.2f}</div>',
+    f'<div class="total-amount">Total: ₹{bill_totals().subtotal:.2f}</div>',
     unsafe_allow_html=True
 )
 
@@ -1206,8 +1304,6 @@ with col2:
         st.session_state["cust_email"] = st.text_input("Customer Email", value=st.session_state["cust_email"], disabled=st.session_state["payment_option"] is not None)
         st.session_state["cust_addr"] = st.text_input("Customer Address", value=st.session_state["cust_addr"], disabled=st.session_state["payment_option"] is not None)
 
-        order_id = get_local_time().strftime("%Y%m%d-%H%M%S")
-        
         st.write("---")
         st.subheader("Payment")
 
@@ -1216,56 +1312,79 @@ with col2:
                 st.error("Customer Name, Phone, and Address are required.")
             else:
                 st.session_state["payment_option"] = "pending"
+                # One ID per checkout, reused by the log, PDF, email, WhatsApp and Razorpay
+                if not st.session_state["order_id"]:
+                    st.session_state["order_id"] = order_store.next_order_id(today_iso())
+
+        order_id = st.session_state["order_id"]
 
         if st.session_state["payment_option"] == "pending":
+            # ----- Pickup time: quoted from the kitchen's slot table, committed when the order is placed -----
+            weight, longest = bill_prep()
+            now = time.time()
+            earliest = now + longest * 60
+
+            def pickup_label(choice):
+                window = PICKUP_WINDOWS[choice]
+                if window is None:
+                    return choice
+                ready = pickup_scheduler.quote(weight, max(earliest, now + window[0] * 60), now + window[1] * 60)
+                return f"{choice} (ready by {format_pickup(ready)})" if ready else f"{choice} (not available)"
+
+            pickup_choice = st.radio("Pickup Time", PICKUP_TIME_SLOTS, format_func=pickup_label, key="pickup_choice")
+            window = PICKUP_WINDOWS[pickup_choice]
+            if window is None:
+                suggested = get_local_time() + timedelta(minutes=30)
+                wanted = st.time_input(
+                    "Pickup at",
+                    value=suggested.replace(minute=suggested.minute // 10 * 10, second=0, microsecond=0).time(),
+                    step=SLOT_MINUTES * 60,
+                    key="pickup_at",
+                )
+                wanted_ts = get_local_time().replace(
+                    hour=wanted.hour, minute=wanted.minute, second=0, microsecond=0
+                ).timestamp()
+                not_before, not_after = max(earliest, wanted_ts), wanted_ts + SLOT_MINUTES * 60
+            else:
+                not_before, not_after = max(earliest, now + window[0] * 60), now + window[1] * 60
+
+            ready = pickup_scheduler.quote(weight, not_before, not_after)
+            if ready:
+                st.info(f"🕒 Your order will be ready for pickup by {format_pickup(ready)}.")
+            else:
+                # Full, past or outside opening hours: offer the next free slot instead
+                ready = pickup_scheduler.quote(weight, not_before)
+                if ready:
+                    st.warning(f"We can't have your order ready then. The earliest pickup is {format_pickup(ready)}.")
+                else:
+                    st.error("Sorry, the kitchen is fully booked. Please try again later.")
+            st.session_state["pickup_from"] = not_before if ready else None
+
             payment_options = ["Cash on Pick up", "Online Payment (Card/Netbanking)"]
             if st.session_state.get("show_upi", True):
                 payment_options.insert(0, "UPI")
-            
+
             payment_method = st.radio(
                 "Select Payment Method",
                 payment_options,
-            )
+            ) if ready else None
 
             if payment_method == "UPI":
                 upi_id = "9259317713@ybl"
-                subtotal = st.session_state["total"]
-                delivery_charge_rate = float(
-                    st.session_state.get("delivery_charge_rate", 0.0)
-                )
-                gst_rate = float(st.session_state.get("gst_rate", 0.0))
-                discount = float(st.session_state["discount"])
-                delivery_charge = subtotal * delivery_charge_rate / 100.0
-                gst_amount = subtotal * gst_rate / 100.0
-                grand_total = subtotal + delivery_charge + gst_amount - discount
-                amount = grand_total
-                upi_link = f"upi://pay?pa={upi_id}&pn=Dhaliwal's%20Food%20Court&am={amount:.2f}&cu=INR"
-
-                # Generate QR code
-                qr_img = qrcode.make(upi_link)
-
-                # Save QR code to a BytesIO object
-                buf = BytesIO()
-                qr_img.save(buf)
-
-                st.image(buf, width=200)
+                totals = bill_totals("UPI")
+                upi_link = build_upi_link(upi_id, totals.grand_total_paise)
+
+                # Cached per (UPI ID, amount) across sessions; reruns don't re-encode it
+                st.image(upi_qr_png(upi_id, totals.grand_total_paise), width=200)
                 st.markdown(
                     f'<a href="{upi_link}" target="_blank">Click here to pay via UPI</a>',
                     unsafe_allow_html=True,
                 )
 
                 if st.button("Payment Done"):
-                    subtotal = st.session_state["total"]
-                    delivery_charge_rate = float(
-                        st.session_state.get("delivery_charge_rate", 0.0)
-                    )
-                    gst_rate = float(st.session_state.get("gst_rate", 0.0))
-                    discount = float(st.session_state["discount"])
-                    delivery_charge = subtotal * delivery_charge_rate / 100.0
-                    gst_amount = subtotal * gst_rate / 100.0
-                    grand_total = subtotal + delivery_charge + gst_amount - discount
-                    order_id = get_local_time().strftime("%Y%m%d-%H%M%S")
-                    save_order_log(order_id, subtotal, delivery_charge, gst_amount, discount, grand_total, "UPI", razorpay_fee=0)
+                    cancel_payment_links(order_id)
+                    save_order_log(order_id, totals, "UPI")
+                    order_store.set_payment_status(order_id, "unconfirmed", method="UPI")
                     st.session_state["payment_option"] = "done"
                     st.session_state["payment_method"] = "UPI"
                     st.session_state["order_finalized_time"] = time.time()
@@ -1273,17 +1392,8 @@ with col2:
 
             elif payment_method == "Cash on Pick up":
                 if st.button("Confirm Cash on Pick up"):
-                    subtotal = st.session_state["total"]
-                    delivery_charge_rate = float(
-                        st.session_state.get("delivery_charge_rate", 0.0)
-                    )
-                    gst_rate = float(st.session_state.get("gst_rate", 0.0))
-                    discount = float(st.session_state["discount"])
-                    delivery_charge = subtotal * delivery_charge_rate / 100.0
-                    gst_amount = subtotal * gst_rate / 100.0
-                    grand_total = subtotal + delivery_charge + gst_amount - discount
-                    order_id = get_local_time().strftime("%Y%m%d-%H%M%S")
-                    save_order_log(order_id, subtotal, delivery_charge, gst_amount, discount, grand_total, "Cash on Delivery", razorpay_fee=0)
+                    cancel_payment_links(order_id)
+                    save_order_log(order_id, bill_totals("Cash on Delivery"), "Cash on Delivery")
                     st.session_state["payment_option"] = "cod_confirmed"
                     st.session_state["payment_method"] = "Cash on Delivery"
                     st.session_state["order_finalized_time"] = time.time()
@@ -1293,49 +1403,30 @@ with col2:
                 if not razorpay_client:
                     st.error("Razorpay is not configured.")
                 else:
-                    subtotal = st.session_state["total"]
-                    delivery_charge_rate = float(
-                        st.session_state.get("delivery_charge_rate", 0.0)
-                    )
-                    gst_rate = float(st.session_state.get("gst_rate", 0.0))
-                    discount = float(st.session_state["discount"])
-                    delivery_charge = subtotal * delivery_charge_rate / 100.0
-                    gst_amount = subtotal * gst_rate / 100.0
-                    razorpay_fee = subtotal * 0.026
-                    grand_total = subtotal + delivery_charge + gst_amount - discount + razorpay_fee
-
-
-                    order_currency = "INR"
-                    order_receipt = f"receipt_{order_id}"
+                    totals = bill_totals("Razorpay")
 
                     try:
-                        payment_link = razorpay_client.payment_link.create({ # type: ignore
-                            "amount": int(grand_total * 100),
-                            "currency": "INR",
-                            "description": f"Payment for Order {order_id}",
-                            "customer": {
+                        # One link per order and amount: every rerun asks the manager (a local lookup), so a
+                        # changed bill or a link that has expired or been cancelled meanwhile is replaced
+                        payment_link = get_payment_link_manager(razorpay_client).get_or_create(
+                            order_id,
+                            totals.grand_total_paise,
+                            customer={
                                 "name": st.session_state['cust_name'],
                                 "email": st.session_state['cust_email'],
                                 "contact": st.session_state['cust_phone']
                             },
-                        })
+                            description=f"Payment for Order {order_id}",
+                        )
 
                         st.success("Payment link created successfully! After Successful payment click payment done")
-                        st.markdown(f'<a href="{payment_link["short_url"]}" target="_blank" style="background-color: #F37254; color: white; padding: 10px 20px; text-align: center; text-decoration: none; display: inline-block; border-radius: 5px;">Pay ₹{grand_total:.2f} with Razorpay</a>', unsafe_allow_html=True)
+                        st.markdown(f'<a href="{payment_link["short_url"]}" target="_blank" style="background-color: #F37254; color: white; padding: 10px 20px; text-align: center; text-decoration: none; display: inline-block; border-radius: 5px;">Pay ₹{totals.grand_total:.2f} with Razorpay</a>', unsafe_allow_html=True)
 
                         if st.button("Payment Done"):
-                            subtotal = st.session_state["total"]
-                            delivery_charge_rate = float(
-                                st.session_state.get("delivery_charge_rate", 0.0)
-                            )
-                            gst_rate = float(st.session_state.get("gst_rate", 0.0))
-                            discount = float(st.session_state["discount"])
-                            delivery_charge = subtotal * delivery_charge_rate / 100.0
-                            gst_amount = subtotal * gst_rate / 100.0
-                            razorpay_fee = subtotal * 0.026
-                            grand_total = subtotal + delivery_charge + gst_amount - discount + razorpay_fee
-                            order_id = get_local_time().strftime("%Y%m%d-%H%M%S")
-                            save_order_log(order_id, subtotal, delivery_charge, gst_amount, discount, grand_total, "Razorpay", razorpay_fee=razorpay_fee)
+                            save_order_log(order_id, totals, "Razorpay")
+                            order_store.set_payment_status(order_id, "unconfirmed", method="Razorpay")
+                            if payment_reconciler:
+                                payment_reconciler.poke(order_id)
                             st.session_state["payment_option"] = "done"
                             st.session_state["payment_method"] = "Razorpay"
                             st.session_state["order_finalized_time"] = time.time()
@@ -1348,10 +1439,14 @@ with col2:
                             )
 
         if st.session_state["payment_option"] in ["done", "cod_confirmed"]:
-            if st.session_state["payment_option"] == "done":
+            if st.session_state["payment_option"] == "done" and order_store.payment_status(order_id) == "paid":
+                st.success("Payment received. Your order is confirmed.")
+            elif st.session_state["payment_option"] == "done":
                 st.success("We need to confirm your payment please send your payment details like transaction details on what's app. When we get your payment, we will contact you on call for confirmation of your order.")
             elif st.session_state["payment_option"] == "cod_confirmed":
                 st.success("Your order has been confirmed for Cash on Pick up.")
+            if st.session_state.get("pickup_time"):
+                st.info(f"🕒 Ready for pickup by {format_pickup(st.session_state['pickup_time'])}")
 
             pdf_buffer = build_pdf_receipt(order_id)
             if pdf_buffer:
@@ -1373,22 +1468,14 @@ with col2:
                 st.warning("Please select Email or WhatsApp option.")
 
             if st.button("Finalize Order (Log + Email)"):
-                subtotal = st.session_state["total"]
-                delivery_charge_rate = float(st.session_state.get("delivery_charge_rate", 0.0))
-                delivery_charge = subtotal * delivery_charge_rate / 100.0
-                gst_rate = float(st.session_state.get("gst_rate", 0.0))
-                gst_amount = subtotal * gst_rate / 100.0
-                discount = float(st.session_state["discount"])
-                razorpay_fee = 0.0
-                if st.session_state.get("payment_method") == "Razorpay":
-                    razorpay_fee = subtotal * 0.026
-                grand_total = subtotal + delivery_charge + gst_amount - discount + razorpay_fee
-
                 st.success(f"Order {order_id} has been saved to the order logs.")
 
                 if pdf_buffer:
                     send_email_to_owner(pdf_buffer.getvalue(), order_id)
 
+                if RECEIPT_PRINTER and print_receipt(order_id):
+                    st.success("Receipt sent to the counter printer.")
+
                 if send_email:
                     if not st.session_state["cust_email"]:
                         st.warning("Customer email is empty — cannot send email.")
@@ -1397,7 +1484,7 @@ with col2:
                     else:
                         ok_email = send_email_with_pdf(st.session_state["cust_email"], pdf_buffer.getvalue(), order_id)
                         if ok_email:
-                            st.success(f"Email sent to {st.session_state['cust_email']}")
+                            st.success(f"Email queued for {st.session_state['cust_email']}")
                         else:
                             st.warning("Email failed—check SMTP settings.")
 
@@ -1406,39 +1493,8 @@ with col2:
                 st.divider()
                 st.markdown("### 📱 Send via WhatsApp")
 
-                subtotal = st.session_state["total"]
-                delivery_charge_rate = float(st.session_state.get("delivery_charge_rate", 0.0))
-                delivery_charge = subtotal * delivery_charge_rate / 100.0
-                gst_rate = float(st.session_state.get("gst_rate", 0.0))
-                gst_amount = subtotal * gst_rate / 100.0
-                discount = float(st.session_state["discount"])
-                razorpay_fee = 0.0
-                if st.session_state.get("payment_method") == "Razorpay":
-                    razorpay_fee = subtotal * 0.026
-                grand_total = subtotal + delivery_charge + gst_amount - discount + razorpay_fee
-
                 # Prepare WhatsApp message
-                items_str = "\n".join([
-                    f"- {i['quantity']}x {i['item']} ({i['size']}): ₹{i['price'] * i['quantity']:.2f}"
-                    for i in st.session_state["bill"]
-                ])
-
-                customer_name = st.session_state.get("cust_name", "").strip()
-                cust_name_str = f"Hello {customer_name},\n\n" if customer_name else ""
-                razorpay_fee_str = f"*Razorpay Fee:* ₹{razorpay_fee:.2f}\n" if razorpay_fee > 0 else ""
-
-                message = (
-                    f"{cust_name_str}Thank you for your order from Dhaliwals Food Court!\n\n"
-                    f"*Order ID:* {order_id}\n"
-                    f"*Date:* {get_local_time().strftime('%d %b %Y %H:%M')}\n\n"
-                    f"*Items:*\n{items_str}\n\n"
-                    f"*Subtotal:* ₹{subtotal:.2f}\n"
-                    f"*Delivery Charge:* ₹{delivery_charge:.2f}\n"
-                    f"*GST ({gst_rate}%):* ₹{gst_amount:.2f}\n"
-                    f"{razorpay_fee_str}"
-                    f"*Grand Total:* ₹{grand_total:.2f}\n\n"
-                    f"We hope you enjoy your meal!"
-                )
+                message = build_whatsapp_message(order_id, bill_totals(st.session_state.get("payment_method")))
 
                 col1, col2 = st.columns(2)
 
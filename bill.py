@@ -0,0 +1,121 @@
+from dataclasses import dataclass
+from decimal import Decimal, ROUND_HALF_UP
+
+RAZORPAY_FEE_RATE = 2.6  # % of subtotal added when paying through Razorpay
+
+
+def to_paise(rupees) -> int:
+    """Convert a rupee amount to integer paise, rounding half up."""
+    return int((Decimal(str(rupees)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def percent_of(paise: int, rate) -> int:
+    """rate% of an amount in paise, rounded half up to a whole paisa."""
+    return int((Decimal(paise) * Decimal(str(rate)) / 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+@dataclass(frozen=True)
+class BillTotals:
+    """All amounts are integer paise; the rupee properties are for display and logging."""
+    subtotal_paise: int
+    delivery_charge_paise: int
+    gst_paise: int
+    discount_paise: int
+    razorpay_fee_paise: int
+    gst_rate: float
+
+    @property
+    def grand_total_paise(self) -> int:
+        return (self.subtotal_paise + self.delivery_charge_paise + self.gst_paise
+                - self.discount_paise + self.razorpay_fee_paise)
+
+    @property
+    def subtotal(self) -> float:
+        return self.subtotal_paise / 100
+
+    @property
+    def delivery_charge(self) -> float:
+        return self.delivery_charge_paise / 100
+
+    @property
+    def gst_amount(self) -> float:
+        return self.gst_paise / 100
+
+    @property
+    def discount(self) -> float:
+        return self.discount_paise / 100
+
+    @property
+    def razorpay_fee(self) -> float:
+        return self.razorpay_fee_paise / 100
+
+    @property
+    def grand_total(self) -> float:
+        return self.grand_total_paise / 100
+
+
+class Bill:
+    """
+    The customer's current order, keyed by (item, size) so adding or removing a line is O(1).
+    Iterating yields the same line dicts the old session-state list held:
+    {"item", "price", "size", "quantity"} with price in rupees.
+    """
+
+    def __init__(self):
+        self._lines = {}
+        self._version = 0
+        self._totals_cache = None
+
+    def __iter__(self):
+        for line in self._lines.values():
+            yield {
+                "item": line["item"],
+                "price": line["price_paise"] / 100,
+                "size": line["size"],
+                "quantity": line["quantity"],
+            }
+
+    def __len__(self):
+        return len(self._lines)
+
+    def __bool__(self):
+        return bool(self._lines)
+
+    @property
+    def version(self) -> int:
+        """Bumped on every change; lets callers cache anything derived from the bill."""
+        return self._version
+
+    def add(self, item, price, size, quantity: int = 1):
+        key = (str(item), str(size))
+        line = self._lines.get(key)
+        if line is None:
+            self._lines[key] = {"item": key[0], "price_paise": to_paise(price), "size": key[1], "quantity": int(quantity)}
+        else:
+            line["quantity"] += int(quantity)
+        self._version += 1
+
+    def remove(self, item, size):
+        if self._lines.pop((str(item), str(size)), None) is not None:
+            self._version += 1
+
+    def subtotal_paise(self) -> int:
+        return sum(line["price_paise"] * line["quantity"] for line in self._lines.values())
+
+    def totals(self, delivery_charge_rate=0.0, gst_rate=0.0, discount=0.0, payment_method=None) -> BillTotals:
+        """Subtotal, charges and grand total, memoized until the bill or the inputs change."""
+        key = (self._version, float(delivery_charge_rate), float(gst_rate), float(discount), payment_method == "Razorpay")
+        if self._totals_cache is not None and self._totals_cache[0] == key:
+            return self._totals_cache[1]
+
+        subtotal = self.subtotal_paise()
+        totals = BillTotals(
+            subtotal_paise=subtotal,
+            delivery_charge_paise=percent_of(subtotal, delivery_charge_rate),
+            gst_paise=percent_of(subtotal, gst_rate),
+            discount_paise=to_paise(discount),
+            razorpay_fee_paise=percent_of(subtotal, RAZORPAY_FEE_RATE) if payment_method == "Razorpay" else 0,
+            gst_rate=float(gst_rate),
+        )
+        self._totals_cache = (key, totals)
+        return totals
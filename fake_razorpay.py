@@ -0,0 +1,139 @@
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeRazorpay:
+    """
+    Local stand-in for the Razorpay payment links API, for checking the app without a live account.
+    Point razorpay.Client at base_url (the RAZORPAY_BASE_URL secret for app.py). Like Razorpay,
+    a second link with the same reference_id is rejected, and an unpaid link expires at its expire_by;
+    pay() marks a link paid as a customer would.
+    """
+
+    def __init__(self, port: int = 0):
+        self.links = {}    # link ID -> payment link entity
+        self.calls = []    # (method, path) of every request, for counting API calls
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self) -> "FakeRazorpay":
+        threading.Thread(target=self.server.serve_forever, name="fake-razorpay", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def pay(self, link_id: str):
+        with self._lock:
+            link = self.links[link_id]
+            link.update(status="paid", amount_paid=link["amount"])
+
+    def creates(self) -> int:
+        return sum(1 for method, path in self.calls if method == "POST" and path == "/v1/payment_links")
+
+    # ---- API ----
+
+    def _create(self, data: dict):
+        with self._lock:
+            if any(link["reference_id"] == data.get("reference_id") for link in self.links.values()):
+                return 400, _error("reference_id already exists")
+            link_id = f"plink_{next(self._ids)}"
+            self.links[link_id] = {
+                "id": link_id,
+                "short_url": f"https://rzp.io/i/{link_id}",
+                "status": "created",
+                "amount": data["amount"],
+                "amount_paid": 0,
+                "reference_id": data.get("reference_id"),
+                "expire_by": data.get("expire_by"),
+                "payments": None,
+            }
+            return 200, self.links[link_id]
+
+    def _expire(self, link: dict) -> dict:
+        if link and link["status"] == "created" and link["expire_by"] and time.time() >= link["expire_by"]:
+            link["status"] = "expired"
+        return link
+
+    def _cancel(self, link_id: str):
+        with self._lock:
+            link = self._expire(self.links.get(link_id))
+            if link is None:
+                return 404, _error("not found")
+            if link["status"] != "created":
+                return 400, _error(f"payment link is {link['status']} and cannot be cancelled")
+            link["status"] = "cancelled"
+            return 200, link
+
+    def _fetch(self, link_id: str):
+        with self._lock:
+            link = self._expire(self.links.get(link_id))
+            return (200, link) if link else (404, _error("not found"))
+
+    def _list(self, query: dict):
+        with self._lock:
+            found = [link for link in self.links.values()
+                     if "reference_id" not in query or link["reference_id"] == query["reference_id"][0]]
+            return 200, {"payment_links": found}
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                fake.calls.append(("POST", self.path))
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                parts = self.path.strip("/").split("/")
+                if self.path == "/v1/payment_links":
+                    self._reply(*fake._create(json.loads(body or b"{}")))
+                elif len(parts) == 4 and parts[3] == "cancel":
+                    self._reply(*fake._cancel(parts[2]))
+                else:
+                    self._reply(404, _error("not found"))
+
+            def do_GET(self):
+                fake.calls.append(("GET", self.path))
+                url = urlparse(self.path)
+                parts = url.path.strip("/").split("/")
+                if url.path == "/v1/payment_links":
+                    self._reply(*fake._list(parse_qs(url.query)))
+                elif len(parts) == 3:
+                    self._reply(*fake._fetch(parts[2]))
+                else:
+                    self._reply(404, _error("not found"))
+
+            def _reply(self, code: int, payload: dict):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def _error(description: str) -> dict:
+    return {"error": {"code": "BAD_REQUEST_ERROR", "description": description}}
+
+
+if __name__ == "__main__":
+    # python fake_razorpay.py [port]   serve until Ctrl+C; set RAZORPAY_BASE_URL to the printed URL
+    import sys
+
+    fake = FakeRazorpay(int(sys.argv[1]) if len(sys.argv) > 1 else 8765)
+    print(f"Fake Razorpay listening on {fake.base_url}")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        fake.server.server_close()
@@ -0,0 +1,259 @@
+import hashlib
+import os
+import stat
+import threading
+import time
+from dataclasses import dataclass
+from io import BytesIO
+
+import pandas as pd
+
+from thumbnails import prewarm_thumbnails
+
+MENU_COLUMNS = ["Item", "Half", "Full", "Image"]
+DEFAULT_CATEGORY = "Fast Food"
+
+# Process-wide menu cache shared by every Streamlit session.
+# One slot per source ("file" or "upload") so the cache never grows
+# past two parsed menus, whatever the number of connected customers.
+_cache_lock = threading.Lock()
+_menu_cache = {}
+_cache_stats = {"hits": 0, "misses": 0}
+
+
+def clean_menu(df: pd.DataFrame) -> pd.DataFrame:
+    """Validate the menu columns and coerce them to the types the app expects."""
+    for col in MENU_COLUMNS:
+        if col not in df.columns:
+            raise ValueError("Excel must have 'Item', 'Half', 'Full' and 'Image' columns")
+    df["Half"] = pd.to_numeric(df["Half"], errors="coerce").fillna(0)
+    df["Full"] = pd.to_numeric(df["Full"], errors="coerce").fillna(0)
+    df["Item"] = df["Item"].fillna("").astype(str)
+    df["Image"] = df["Image"].fillna("").astype(str)
+    return df
+
+
+def snapshot_path(path: str) -> str:
+    """Precompiled snapshot kept next to the workbook, e.g. DhalisMenu_cat.menu.pkl."""
+    return os.path.splitext(path)[0] + ".menu.pkl"
+
+
+def _source_stamp(path: str) -> tuple:
+    st_ = os.stat(path)
+    return st_.st_mtime_ns, st_.st_size
+
+
+def write_snapshot(path: str, df: pd.DataFrame):
+    """Pickle the already-cleaned menu, stamped with the workbook's mtime and size, so cold starts skip openpyxl."""
+    snap = snapshot_path(path)
+    tmp = snap + ".tmp"
+    pd.to_pickle({"source": _source_stamp(path), "menu": df}, tmp)
+    os.replace(tmp, snap)
+
+
+def read_snapshot(path: str):
+    """The snapshot's menu if it was written from the workbook as it is now, else None."""
+    try:
+        snap = pd.read_pickle(snapshot_path(path))
+        if isinstance(snap, dict) and snap.get("source") == _source_stamp(path):
+            return snap["menu"]
+    except Exception:
+        # Missing, corrupt or written by another pandas/pickle version: rebuild it from the workbook
+        pass
+    return None
+
+
+def _read_menu_file(path: str) -> pd.DataFrame:
+    """Load the snapshot when it matches the workbook, else parse the workbook and rewrite the snapshot."""
+    df = read_snapshot(path)
+    if df is not None:
+        return df
+
+    df = clean_menu(pd.read_excel(path, engine="openpyxl"))
+    try:
+        write_snapshot(path, df)
+    except OSError:
+        pass
+    return df
+
+
+def menu_cache_key(path: str, uploaded_file=None) -> tuple:
+    """Key for the current menu source: path+mtime+size, or the upload's content hash."""
+    if uploaded_file is not None:
+        digest = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+        return ("upload", digest)
+    st_ = os.stat(path)
+    return ("file", os.path.abspath(path), st_.st_mtime_ns, st_.st_size)
+
+
+@dataclass(frozen=True, slots=True)
+class ImageRef:
+    """An Image entry resolved once per menu version, so the grid never probes the filesystem."""
+    kind: str          # "file" | "url" | "missing" | "none"
+    src: str           # absolute path, URL, or the entry as written when the file is missing
+    mtime_ns: int = 0  # for files: matches the thumbnail cache key
+
+
+NO_IMAGE = ImageRef("none", "")
+
+
+def resolve_image(entry: str, base_dir: str) -> ImageRef:
+    """Relative paths are taken from the menu workbook's folder, not the process CWD."""
+    entry = str(entry).strip()
+    if not entry:
+        return NO_IMAGE
+    if entry.lower().startswith(("http://", "https://")):
+        return ImageRef("url", entry)
+    path = os.path.normpath(os.path.join(base_dir, os.path.expanduser(entry)))
+    try:
+        st_ = os.stat(path)
+    except OSError:
+        return ImageRef("missing", entry)
+    if not stat.S_ISREG(st_.st_mode):
+        return ImageRef("missing", entry)
+    return ImageRef("file", path, st_.st_mtime_ns)
+
+
+def build_image_manifest(entries, base_dir: str) -> dict:
+    """Image entry -> ImageRef, one stat per distinct entry."""
+    return {entry: resolve_image(entry, base_dir) for entry in dict.fromkeys(str(e).strip() for e in entries)}
+
+
+def missing_images(manifest: dict) -> list:
+    return [ref.src for ref in manifest.values() if ref.kind == "missing"]
+
+
+@dataclass(frozen=True, slots=True)
+class MenuItem:
+    """One menu tile, precomputed so the grid never touches the DataFrame."""
+    name: str
+    half: float
+    full: float
+    image: str
+    category: str
+    key: str           # unique widget key, stable for a given menu version
+    search_name: str   # lower-cased name for the search box
+    image_ref: ImageRef = NO_IMAGE
+
+
+def build_menu_index(df: pd.DataFrame, images: dict = None) -> dict:
+    """Group the menu into category -> tuple of MenuItem, preserving file order."""
+    images = images or {}
+    if "Category" in df.columns:
+        categories = df["Category"].fillna(DEFAULT_CATEGORY).astype(str).tolist()
+    else:
+        categories = [DEFAULT_CATEGORY] * len(df)
+
+    grouped = {}
+    for category, name, half, full, image in zip(
+        categories, df["Item"].tolist(), df["Half"].tolist(), df["Full"].tolist(), df["Image"].tolist()
+    ):
+        items = grouped.setdefault(category, [])
+        image = str(image).strip()
+        items.append(MenuItem(
+            name=name,
+            half=half,
+            full=full,
+            image=image,
+            category=category,
+            key=f"{category}_{name}_{len(items)}",
+            search_name=name.lower(),
+            image_ref=images.get(image, NO_IMAGE),
+        ))
+    return {category: tuple(items) for category, items in grouped.items()}
+
+
+def _menu_entry(path: str, uploaded_file=None, count: bool = True) -> dict:
+    """Cached {key, df, images, index} for the current menu source, parsing only when the key changed."""
+    key = menu_cache_key(path, uploaded_file)
+    slot = key[0]
+
+    with _cache_lock:
+        cached = _menu_cache.get(slot)
+        if cached is not None and cached["key"] == key:
+            if count:
+                _cache_stats["hits"] += 1
+            return cached
+
+    if uploaded_file is not None:
+        df = clean_menu(pd.read_excel(BytesIO(uploaded_file.getvalue()), engine="openpyxl"))
+    else:
+        df = _read_menu_file(path)
+    images = build_image_manifest(df["Image"].tolist(), os.path.dirname(os.path.abspath(path)))
+    entry = {"key": key, "df": df, "images": images, "index": build_menu_index(df, images)}
+
+    with _cache_lock:
+        _cache_stats["misses"] += 1
+        _menu_cache[slot] = entry
+
+    # Pre-generate grid thumbnails in the background so the first customer doesn't pay for it
+    local = [ref.src for ref in images.values() if ref.kind == "file"]
+    if local:
+        threading.Thread(target=prewarm_thumbnails, args=(local,), daemon=True).start()
+    return entry
+
+
+def read_menu(path: str, uploaded_file=None) -> pd.DataFrame:
+    """
+    Return the cleaned menu, parsing the workbook only when its cache key changed.
+    A copy is returned so callers can add columns without touching the cached frame.
+    """
+    return _menu_entry(path, uploaded_file)["df"].copy()
+
+
+def read_menu_index(path: str, uploaded_file=None) -> dict:
+    """Category index for the same menu version read_menu() returns. Treat it as read-only."""
+    return _menu_entry(path, uploaded_file, count=False)["index"]
+
+
+def read_image_manifest(path: str, uploaded_file=None) -> dict:
+    """Resolved images for the same menu version read_menu() returns. Treat it as read-only."""
+    return _menu_entry(path, uploaded_file, count=False)["images"]
+
+
+def write_menu(path: str, df: pd.DataFrame):
+    """Save the menu workbook plus its snapshot and drop the cached copy so every session reloads it."""
+    df.to_excel(path, index=False, engine="openpyxl")
+    write_snapshot(path, clean_menu(df.copy()))
+    invalidate_menu_cache()
+
+
+def invalidate_menu_cache():
+    with _cache_lock:
+        _menu_cache.clear()
+
+
+def menu_cache_stats() -> dict:
+    with _cache_lock:
+        return {**_cache_stats, "entries": len(_menu_cache)}
+
+
+if __name__ == "__main__":
+    # Benchmark: full workbook parse vs. snapshot load (python menu_store.py [menu.xlsx])
+    import shutil
+    import sys
+    import tempfile
+
+    src = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), "DhalisMenu_cat.xlsx")
+    runs = 20
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        xlsx = os.path.join(tmp_dir, os.path.basename(src))
+        shutil.copy(src, xlsx)
+
+        t0 = time.perf_counter()
+        for _ in range(runs):
+            df = clean_menu(pd.read_excel(xlsx, engine="openpyxl"))
+        xlsx_ms = (time.perf_counter() - t0) * 1000 / runs
+
+        write_snapshot(xlsx, df)
+        t0 = time.perf_counter()
+        for _ in range(runs):
+            snap_df = read_snapshot(xlsx)
+        snap_ms = (time.perf_counter() - t0) * 1000 / runs
+
+        assert snap_df.equals(df)
+        print(f"Items: {len(df)}")
+        print(f"openpyxl parse : {xlsx_ms:8.2f} ms")
+        print(f"snapshot load  : {snap_ms:8.2f} ms")
+        print(f"speed-up       : {xlsx_ms / snap_ms:8.1f}x")
@@ -0,0 +1,94 @@
+import atexit
+import queue
+import threading
+from concurrent.futures import Future
+
+ORDER_COLUMNS = [
+    "Date", "Time", "OrderID", "CustomerName", "Phone", "Email",
+    "Address", "Items", "Subtotal", "DeliveryChargeAmount", "GST",
+    "PaymentMethod", "Discount", "razorpay_fee", "GrandTotal",
+]
+
+
+class OrderWriter:
+    """
+    Single background thread that owns all order-log writes in this process.
+    Rows submitted within batch_window seconds of each other are written together,
+    one transaction per store, and the caller never waits on disk.
+    """
+
+    _STOP = object()
+
+    def __init__(self, batch_window: float = 0.005):
+        self.batch_window = batch_window
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="order-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, writes: list) -> Future:
+        """
+        Queue [(sink, row), ...] for one order; returns a Future.
+        A sink is an object with write_orders(rows), e.g. OrderStore.
+        """
+        future = Future()
+        self._queue.put((writes, future))
+        return future
+
+    def close(self, timeout: float = 10.0):
+        """Flush everything queued so far and stop the thread."""
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is self._STOP:
+                return
+            batch = [job]
+            stop = False
+            while True:
+                try:
+                    job = self._queue.get(timeout=self.batch_window)
+                except queue.Empty:
+                    break
+                if job is self._STOP:
+                    stop = True
+                    break
+                batch.append(job)
+            self._write_batch(batch)
+            if stop:
+                return
+
+    def _write_batch(self, batch: list):
+        rows_by_sink = {}
+        for writes, _ in batch:
+            for sink, row in writes:
+                rows_by_sink.setdefault(sink, []).append(row)
+
+        errors = {}
+        for sink, rows in rows_by_sink.items():
+            try:
+                sink.write_orders(rows)
+            except Exception as e:
+                errors[sink] = e
+
+        for writes, future in batch:
+            failed = [errors[sink] for sink, _ in writes if sink in errors]
+            if failed:
+                future.set_exception(failed[0])
+            else:
+                future.set_result(len(writes))
+
+
+_writer_lock = threading.Lock()
+_order_writer = None
+
+def get_order_writer() -> OrderWriter:
+    """Process-wide writer; flushed on interpreter exit."""
+    global _order_writer
+    with _writer_lock:
+        if _order_writer is None:
+            _order_writer = OrderWriter()
+            atexit.register(_order_writer.close)
+        return _order_writer
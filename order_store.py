@@ -0,0 +1,547 @@
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from io import BytesIO
+
+import pandas as pd
+
+from order_log import ORDER_COLUMNS
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+ORDERS_DB = os.path.join(APP_DIR, "orders.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY,
+    order_date TEXT NOT NULL,          -- ISO YYYY-MM-DD, local (IST) date
+    order_time TEXT,
+    order_id TEXT,
+    customer_name TEXT,
+    phone TEXT,
+    email TEXT,
+    address TEXT,
+    items TEXT,                        -- display string as shown in orders.csv
+    subtotal REAL,
+    delivery_charge REAL,
+    gst REAL,
+    payment_method TEXT,
+    discount REAL,
+    razorpay_fee REAL,
+    grand_total REAL
+);
+CREATE INDEX IF NOT EXISTS idx_orders_date ON orders(order_date);
+CREATE INDEX IF NOT EXISTS idx_orders_phone ON orders(phone);
+CREATE INDEX IF NOT EXISTS idx_orders_payment ON orders(payment_method, order_date);
+
+CREATE TABLE IF NOT EXISTS order_items (
+    id INTEGER PRIMARY KEY,
+    order_pk INTEGER NOT NULL REFERENCES orders(id),
+    item TEXT NOT NULL,
+    size TEXT,
+    quantity INTEGER NOT NULL,
+    price REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items(order_pk);
+
+CREATE TABLE IF NOT EXISTS order_sequence (
+    day TEXT PRIMARY KEY,              -- YYYYMMDD
+    last INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS order_payments (
+    order_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,              -- unconfirmed | paid | expired | cancelled
+    method TEXT,
+    amount_paid REAL,
+    reference TEXT,                    -- Razorpay payment link / payment ID
+    updated_at TEXT NOT NULL
+);
+
+-- Per-day, per-hour totals kept up to date by write_orders (rebuild_rollups / check_rollups)
+CREATE TABLE IF NOT EXISTS rollup_payments (
+    order_date TEXT NOT NULL,
+    hour INTEGER NOT NULL,             -- 0-23, or -1 for orders without a time (legacy rows)
+    payment_method TEXT NOT NULL,
+    orders INTEGER NOT NULL,
+    revenue REAL NOT NULL,             -- sum of grand_total
+    PRIMARY KEY (order_date, hour, payment_method)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS rollup_items (
+    order_date TEXT NOT NULL,
+    hour INTEGER NOT NULL,
+    item TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    revenue REAL NOT NULL,             -- sum of quantity * price
+    PRIMARY KEY (order_date, hour, item)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# orders table column -> orders.csv column
+CSV_COLUMN_MAP = {
+    "order_date": "Date",
+    "order_time": "Time",
+    "order_id": "OrderID",
+    "customer_name": "CustomerName",
+    "phone": "Phone",
+    "email": "Email",
+    "address": "Address",
+    "items": "Items",
+    "subtotal": "Subtotal",
+    "delivery_charge": "DeliveryChargeAmount",
+    "gst": "GST",
+    "payment_method": "PaymentMethod",
+    "discount": "Discount",
+    "razorpay_fee": "razorpay_fee",
+    "grand_total": "GrandTotal",
+}
+
+# Same hour rule in SQL (rebuilds) and Python (incremental updates)
+HOUR_SQL = "CASE WHEN order_time GLOB '[0-2][0-9]:*' THEN CAST(substr(order_time, 1, 2) AS INTEGER) ELSE -1 END"
+
+ROLLUP_PAYMENTS_SQL = (
+    f"SELECT order_date, {HOUR_SQL} AS hour, COALESCE(payment_method, '') AS payment_method,"
+    " COUNT(*) AS orders, COALESCE(SUM(grand_total), 0) AS revenue"
+    " FROM orders GROUP BY 1, 2, 3"
+)
+ROLLUP_ITEMS_SQL = (
+    f"SELECT o.order_date, {HOUR_SQL.replace('order_time', 'o.order_time')} AS hour, oi.item,"
+    " SUM(oi.quantity) AS quantity, SUM(oi.quantity * oi.price) AS revenue"
+    " FROM order_items oi JOIN orders o ON o.id = oi.order_pk GROUP BY 1, 2, 3"
+)
+
+# "2x Chumin(Full)-₹50.00" (legacy rows may have lost the ₹ sign)
+ITEM_RE = re.compile(r"^\s*(\d+)x (.+)\(([^()]*)\)-\D*([\d.]+)\s*$")
+
+
+def parse_items(items: str) -> list:
+    """Line items from an orders.csv Items string; free-text legacy rows give []."""
+    lines = []
+    for part in str(items or "").split("; "):
+        m = ITEM_RE.match(part)
+        if m:
+            lines.append({"item": m.group(2), "size": m.group(3), "quantity": int(m.group(1)), "price": float(m.group(4))})
+    return lines
+
+
+# orders.csv uses DD-MM-YYYY; hand-edited files sometimes end up with the other two
+DATE_FORMATS = ("%d-%m-%Y", "%d/%m/%Y", "%Y-%m-%d")
+
+
+def _iso_date(date_str: str) -> str:
+    """The store keeps ISO dates so they sort and index correctly; raises ValueError for anything else."""
+    date_str = str(date_str).strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(date_str, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    raise ValueError(f"unrecognised order date {date_str!r}")
+
+
+def _money(value) -> float:
+    try:
+        return 0.0 if value is None or value == "" or pd.isna(value) else float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _text(value) -> str:
+    return "" if value is None or (isinstance(value, float) and pd.isna(value)) else str(value)
+
+
+def _hour(time_str: str) -> int:
+    return int(time_str[:2]) if re.match(r"[0-2][0-9]:", time_str) else -1
+
+
+class OrderStore:
+    """
+    SQLite (WAL) system of record for orders and their line items.
+    One connection per thread; safe to share one instance across Streamlit sessions.
+    """
+
+    def __init__(self, path: str = ORDERS_DB):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+        if not self._conn().execute("SELECT 1 FROM meta WHERE key = 'rollups_built'").fetchone():
+            # Database from before the rollup tables existed
+            self.rebuild_rollups()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    # ---- writes ----
+
+    def next_order_id(self, day: str) -> str:
+        """
+        Allocate the next order ID for a day, e.g. 20260120-0007.
+        The counter lives in the database and is bumped inside a write transaction,
+        so IDs are unique and increasing across sessions and processes.
+        """
+        day = day.replace("-", "")
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO order_sequence (day, last) VALUES (?, 1)"
+                " ON CONFLICT(day) DO UPDATE SET last = last + 1",
+                (day,),
+            )
+            seq = conn.execute("SELECT last FROM order_sequence WHERE day = ?", (day,)).fetchone()[0]
+        return f"{day}-{seq:04d}"
+
+    def write_orders(self, rows: list):
+        """
+        Insert orders.csv-shaped rows in one transaction, updating the rollups in the same one.
+        A row may carry a "Lines" list of {"item", "size", "quantity", "price"};
+        otherwise the lines are parsed from its Items string.
+        """
+        conn = self._conn()
+        with conn:
+            for row in rows:
+                self._insert_order(conn, row, _iso_date(row["Date"]))
+
+    def _insert_order(self, conn: sqlite3.Connection, row: dict, day: str):
+        time_str = _text(row.get("Time"))
+        payment_method, grand_total = _text(row.get("PaymentMethod")), _money(row.get("GrandTotal"))
+        cur = conn.execute(
+            "INSERT INTO orders (order_date, order_time, order_id, customer_name, phone, email, address,"
+            " items, subtotal, delivery_charge, gst, payment_method, discount, razorpay_fee, grand_total)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                day,
+                time_str,
+                _text(row.get("OrderID")),
+                _text(row.get("CustomerName")),
+                _text(row.get("Phone")),
+                _text(row.get("Email")),
+                _text(row.get("Address")),
+                _text(row.get("Items")),
+                _money(row.get("Subtotal")),
+                _money(row.get("DeliveryChargeAmount")),
+                _money(row.get("GST")),
+                payment_method,
+                _money(row.get("Discount")),
+                _money(row.get("razorpay_fee")),
+                grand_total,
+            ),
+        )
+        lines = row.get("Lines")
+        if lines is None:
+            lines = parse_items(row.get("Items"))
+        conn.executemany(
+            "INSERT INTO order_items (order_pk, item, size, quantity, price) VALUES (?, ?, ?, ?, ?)",
+            [(cur.lastrowid, ln["item"], ln["size"], int(ln["quantity"]), float(ln["price"])) for ln in lines],
+        )
+
+        # O(1) per order: one upsert for its payment method plus one per line item
+        hour = _hour(time_str)
+        conn.execute(
+            "INSERT INTO rollup_payments (order_date, hour, payment_method, orders, revenue) VALUES (?, ?, ?, 1, ?)"
+            " ON CONFLICT(order_date, hour, payment_method) DO UPDATE SET"
+            " orders = orders + 1, revenue = revenue + excluded.revenue",
+            (day, hour, payment_method, grand_total),
+        )
+        conn.executemany(
+            "INSERT INTO rollup_items (order_date, hour, item, quantity, revenue) VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT(order_date, hour, item) DO UPDATE SET"
+            " quantity = quantity + excluded.quantity, revenue = revenue + excluded.revenue",
+            [(day, hour, ln["item"], int(ln["quantity"]), int(ln["quantity"]) * float(ln["price"])) for ln in lines],
+        )
+
+    def rebuild_rollups(self):
+        """Regenerate the rollup tables from orders and order_items, in one transaction."""
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM rollup_payments")
+            conn.execute("DELETE FROM rollup_items")
+            conn.execute(f"INSERT INTO rollup_payments (order_date, hour, payment_method, orders, revenue) {ROLLUP_PAYMENTS_SQL}")
+            conn.execute(f"INSERT INTO rollup_items (order_date, hour, item, quantity, revenue) {ROLLUP_ITEMS_SQL}")
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('rollups_built', ?)"
+                " ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (datetime.now().isoformat(timespec="seconds"),),
+            )
+
+    def check_rollups(self) -> list:
+        """Differences between the rollup tables and a full rescan of the orders; [] when consistent."""
+        conn = self._conn()
+        problems = []
+        for table, source, keys, values in (
+            ("rollup_payments", ROLLUP_PAYMENTS_SQL, "order_date, hour, payment_method", "orders, revenue"),
+            ("rollup_items", ROLLUP_ITEMS_SQL, "order_date, hour, item", "quantity, revenue"),
+        ):
+            expected = {tuple(r[:3]): tuple(r[3:]) for r in conn.execute(source)}
+            stored = {tuple(r[:3]): tuple(r[3:]) for r in conn.execute(f"SELECT {keys}, {values} FROM {table}")}
+            for key in sorted(expected.keys() | stored.keys(), key=str):
+                want, have = expected.get(key, (0, 0.0)), stored.get(key, (0, 0.0))
+                if want[0] != have[0] or abs(want[1] - have[1]) > 0.005:
+                    problems.append(f"{table} {key}: expected {want}, stored {have}")
+        return problems
+
+    def import_orders_csv(self, csv_path: str) -> int:
+        """
+        One-shot import of the legacy orders.csv (rows may lack Time/OrderID).
+        The marker check, the rows and the marker share one IMMEDIATE transaction, so a crash
+        or a second process starting at the same time can't import the file twice.
+        Rows whose date can't be read are skipped and counted. Returns rows imported.
+        """
+        rows = []
+        if os.path.exists(csv_path):
+            rows = [row for row in pd.read_csv(csv_path, dtype=str, keep_default_na=False).to_dict("records") if row.get("Date")]
+
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'orders_csv_imported'").fetchone():
+                conn.rollback()
+                return 0
+            count, skipped = 0, []
+            for row in rows:
+                try:
+                    day = _iso_date(row["Date"])
+                except ValueError:
+                    skipped.append(row["Date"])
+                    continue
+                self._insert_order(conn, row, day)
+                count += 1
+            note = f"{count} rows from {os.path.basename(csv_path)} at {datetime.now().isoformat(timespec='seconds')}"
+            if skipped:
+                note += f", {len(skipped)} skipped (unreadable dates: {', '.join(sorted(set(skipped))[:10])})"
+            conn.execute("INSERT INTO meta (key, value) VALUES ('orders_csv_imported', ?)", (note,))
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        if skipped:
+            print(f"WARNING: skipped {len(skipped)} orders.csv rows with unreadable dates")
+        return count
+
+    def set_payment_status(self, order_id: str, status: str, method: str = None,
+                           amount_paid: float = None, reference: str = None):
+        """Record an order's payment state; a confirmed 'paid' is never downgraded."""
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO order_payments (order_id, status, method, amount_paid, reference, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(order_id) DO UPDATE SET status = excluded.status,"
+                " method = COALESCE(excluded.method, method), amount_paid = COALESCE(excluded.amount_paid, amount_paid),"
+                " reference = COALESCE(excluded.reference, reference), updated_at = excluded.updated_at"
+                " WHERE order_payments.status != 'paid'",
+                (order_id, status, method, amount_paid, reference, datetime.now().isoformat(timespec="seconds")),
+            )
+
+    # ---- reads / export views ----
+
+    def payment_status(self, order_id: str):
+        row = self._conn().execute("SELECT status FROM order_payments WHERE order_id = ?", (order_id,)).fetchone()
+        return row[0] if row else None
+
+    def payments_frame(self, day: str) -> pd.DataFrame:
+        """One day's orders with their payment state, for the cashier."""
+        return pd.read_sql_query(
+            "SELECT o.order_time AS Time, o.order_id AS OrderID, o.customer_name AS Customer,"
+            " o.payment_method AS Method, o.grand_total AS Total,"
+            " COALESCE(p.status, CASE WHEN o.payment_method = 'Cash on Delivery' THEN 'due at pickup' ELSE 'unconfirmed' END) AS Payment"
+            " FROM orders o LEFT JOIN order_payments p ON p.order_id = o.order_id"
+            " WHERE o.order_date = ? ORDER BY o.id DESC",
+            self._conn(),
+            params=(day,),
+        )
+
+    def orders_frame(self, day: str = None, phone: str = None, payment_method: str = None) -> pd.DataFrame:
+        """Orders as an orders.csv-shaped DataFrame, optionally filtered on an indexed column."""
+        where, params = [], []
+        if day:
+            where.append("order_date = ?")
+            params.append(day)
+        if phone:
+            where.append("phone = ?")
+            params.append(phone)
+        if payment_method:
+            where.append("payment_method = ?")
+            params.append(payment_method)
+        sql = f"SELECT {', '.join(CSV_COLUMN_MAP)} FROM orders"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id"
+
+        df = pd.read_sql_query(sql, self._conn(), params=params)
+        df["order_date"] = pd.to_datetime(df["order_date"]).dt.strftime("%d-%m-%Y")
+        return df.rename(columns=CSV_COLUMN_MAP)[ORDER_COLUMNS]
+
+    def export_csv(self, dest: str = None, day: str = None):
+        """orders.csv view of the store; writes to dest when given, else returns the bytes."""
+        data = self.orders_frame(day=day).to_csv(index=False).encode("utf-8")
+        if dest is None:
+            return data
+        tmp = dest + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, dest)
+        return dest
+
+    def export_excel_bytes(self, day: str) -> bytes:
+        """The old Orders_YYYY-MM-DD.xlsx, generated for one day on request."""
+        buf = BytesIO()
+        self.orders_frame(day=day).to_excel(buf, index=False, engine="openpyxl")
+        return buf.getvalue()
+
+    def day_summary(self, day: str, top_n: int = 5) -> dict:
+        """Order count, revenue by payment method and best-selling items for one day, from the rollups."""
+        conn = self._conn()
+        by_payment = conn.execute(
+            "SELECT payment_method, SUM(orders), SUM(revenue) FROM rollup_payments"
+            " WHERE order_date = ? GROUP BY payment_method ORDER BY 3 DESC",
+            (day,),
+        ).fetchall()
+        top_items = conn.execute(
+            "SELECT item, SUM(quantity), SUM(revenue) FROM rollup_items"
+            " WHERE order_date = ? GROUP BY item ORDER BY 2 DESC, 3 DESC LIMIT ?",
+            (day, top_n),
+        ).fetchall()
+        return {
+            "day": day,
+            "orders": sum(count for _, count, _ in by_payment),
+            "revenue": round(sum(total for _, _, total in by_payment), 2),
+            "by_payment": [(method or "-", count, round(total, 2)) for method, count, total in by_payment],
+            "top_items": [(item, qty, round(total, 2)) for item, qty, total in top_items],
+        }
+
+    def hourly_totals(self, day: str) -> pd.DataFrame:
+        """Orders and revenue per hour for one day, from the rollups."""
+        return pd.read_sql_query(
+            "SELECT hour, SUM(orders) AS orders, SUM(revenue) AS revenue FROM rollup_payments"
+            " WHERE order_date = ? AND hour >= 0 GROUP BY hour ORDER BY hour",
+            self._conn(),
+            params=(day,),
+            index_col="hour",
+        )
+
+    def count_orders(self, day: str = None) -> int:
+        if day:
+            sql, params = "SELECT COALESCE(SUM(orders), 0) FROM rollup_payments WHERE order_date = ?", (day,)
+        else:
+            sql, params = "SELECT COALESCE(SUM(orders), 0) FROM rollup_payments", ()
+        return self._conn().execute(sql, params).fetchone()[0]
+
+
+_store_lock = threading.Lock()
+_stores = {}
+
+
+def get_order_store(path: str = ORDERS_DB, legacy_csv: str = None) -> OrderStore:
+    """Process-wide store per database file; imports legacy_csv the first time the database is created."""
+    with _store_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = OrderStore(path)
+            if legacy_csv:
+                store.import_orders_csv(legacy_csv)
+            _stores[path] = store
+        return store
+
+
+def _benchmark(sizes=(10_000, 1_000_000)):
+    import random
+    import tempfile
+    import time
+
+    methods = ["UPI", "Cash on Delivery", "Razorpay"]
+    items = ["Paneer Patty", "Chumin", "Frooti", "7 Inch Pizza Corn", "Pastry Chocolate"]
+
+    def fake_row(i):
+        day = 1 + i % 28
+        qty = 1 + i % 3
+        item = items[i % len(items)]
+        return {
+            "Date": f"{day:02d}-{1 + (i // 28) % 12:02d}-2025",
+            "Time": "12:00:00",
+            "OrderID": f"2025-{i:08d}",
+            "CustomerName": "Bench",
+            "Phone": f"9{random.randint(0, 99_999):09d}",
+            "Items": f"{qty}x {item}(Full)-₹50.00",
+            "Subtotal": qty * 50,
+            "PaymentMethod": methods[i % len(methods)],
+            "GrandTotal": qty * 50,
+            "Lines": [{"item": item, "size": "Full", "quantity": qty, "price": 50.0}],
+        }
+
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = OrderStore(os.path.join(tmp_dir, "bench.db"))
+            t0 = time.perf_counter()
+            batch = 10_000
+            for start in range(0, n, batch):
+                store.write_orders([fake_row(i) for i in range(start, min(start + batch, n))])
+            insert_s = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            store.write_orders([fake_row(n)])
+            single_ms = (time.perf_counter() - t0) * 1000
+
+            t0 = time.perf_counter()
+            day_df = store.orders_frame(day="2025-06-15")
+            day_ms = (time.perf_counter() - t0) * 1000
+
+            phone = fake_row(0)["Phone"]
+            store.write_orders([{**fake_row(0), "Phone": phone}])
+            t0 = time.perf_counter()
+            store.orders_frame(phone=phone)
+            phone_ms = (time.perf_counter() - t0) * 1000
+
+            t0 = time.perf_counter()
+            store.day_summary("2025-06-15")
+            summary_ms = (time.perf_counter() - t0) * 1000
+
+            t0 = time.perf_counter()
+            store.rebuild_rollups()
+            rebuild_s = time.perf_counter() - t0
+            assert not store.check_rollups()
+
+            print(f"{n:>9,} orders: bulk insert {insert_s:6.2f} s ({n / insert_s:,.0f}/s), "
+                  f"single insert {single_ms:5.2f} ms, day query {day_ms:6.2f} ms ({len(day_df)} rows), "
+                  f"phone query {phone_ms:5.2f} ms, day summary {summary_ms:5.2f} ms, rollup rebuild {rebuild_s:5.2f} s")
+
+
+if __name__ == "__main__":
+    # python order_store.py import [orders.csv]   one-shot legacy import
+    # python order_store.py export [orders.csv]   regenerate the CSV view
+    # python order_store.py rollups-rebuild      regenerate the daily/hourly rollups from scratch
+    # python order_store.py rollups-check        compare the rollups against a full rescan
+    # python order_store.py bench                 insert/query latency at 10k and 1M orders
+    import sys
+
+    cmd = sys.argv[1] if len(sys.argv) > 1 else ""
+    csv_path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(APP_DIR, "orders.csv")
+    if cmd == "import":
+        print(f"Imported {OrderStore().import_orders_csv(csv_path)} rows into {ORDERS_DB}")
+    elif cmd == "export":
+        print(f"Wrote {OrderStore().export_csv(csv_path)}")
+    elif cmd == "rollups-rebuild":
+        OrderStore().rebuild_rollups()
+        print(f"Rebuilt rollups in {ORDERS_DB}")
+    elif cmd == "rollups-check":
+        problems = OrderStore().check_rollups()
+        print("\n".join(problems) or "Rollups are consistent")
+        sys.exit(1 if problems else 0)
+    elif cmd == "bench":
+        _benchmark()
+    else:
+        print("usage: python order_store.py import|export|rollups-rebuild|rollups-check|bench [orders.csv]")
@@ -0,0 +1,369 @@
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+import zipfile
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from io import BytesIO
+
+from smtp_transport import get_secret, get_transport, smtp_settings
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTBOX_DB = os.path.join(APP_DIR, "outbox.db")
+
+MAX_ATTEMPTS = 6          # then the job moves to the dead-letter list
+BASE_BACKOFF = 15         # seconds; doubles after every failed attempt
+MAX_BACKOFF = 30 * 60
+POLL_INTERVAL = 5         # seconds between scans when nothing was enqueued
+CLAIM_TIMEOUT = 5 * 60    # a claimed job becomes due again if its worker dies mid-send
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,                -- e.g. customer_receipt, owner_order
+    sender TEXT NOT NULL,
+    recipients TEXT NOT NULL,          -- JSON list
+    message BLOB NOT NULL,             -- full RFC 822 message (receipt PDF while held); emptied once sent or digested
+    meta TEXT,                         -- JSON, for the Admin Panel and digests
+    status TEXT NOT NULL DEFAULT 'pending',   -- pending | sent | dead | held | digested
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(status, next_attempt_at);
+"""
+
+
+def build_digest_message(sender: str, recipient: str, held: list) -> bytes:
+    """One owner email for many orders: a summary table plus all receipt PDFs in a zip."""
+    metas = [json.loads(job["meta"] or "{}") for job in held]
+    first, last = metas[0].get("order_id", ""), metas[-1].get("order_id", "")
+
+    header = f"{'Order ID':<16}{'Time':<8}{'Customer':<22}{'Phone':<15}{'Payment':<18}{'Total':>10}"
+    rows = [
+        f"{m.get('order_id', ''):<16}{m.get('time', ''):<8}{str(m.get('customer', ''))[:21]:<22}"
+        f"{str(m.get('phone', ''))[:14]:<15}{str(m.get('payment_method', ''))[:17]:<18}{m.get('grand_total', 0):>10.2f}"
+        for m in metas
+    ]
+    revenue = sum(float(m.get("grand_total", 0)) for m in metas)
+
+    msg = MIMEMultipart()
+    msg["From"] = sender
+    msg["To"] = recipient
+    msg["Subject"] = f"New Orders Digest: {len(held)} orders ({first} to {last})"
+    msg.attach(MIMEText(
+        f"{len(held)} new orders have been placed.\n\n"
+        + header + "\n" + "-" * len(header) + "\n" + "\n".join(rows) + "\n\n"
+        + f"Total: ₹{revenue:.2f}\n\nThe bills are attached as PDFs in a zip file.",
+        "plain",
+    ))
+
+    buf = BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for job, meta in zip(held, metas):
+            zf.writestr(f"receipt_{meta.get('order_id', job['id'])}.pdf", job["message"])
+    zip_name = f"receipts_{first}_{last}.zip"
+    part = MIMEApplication(buf.getvalue(), Name=zip_name)
+    part["Content-Disposition"] = f'attachment; filename="{zip_name}"'
+    msg.attach(part)
+    return msg.as_bytes()
+
+
+def smtp_send(config: dict, sender: str, recipients: list, message: bytes):
+    """Deliver one message over the shared pooled connection for this account."""
+    get_transport(**config).send(sender, recipients, message)
+
+
+class Outbox:
+    """
+    Persistent queue of outgoing emails with a background delivery thread.
+    enqueue() only writes to outbox.db, so the Streamlit run never waits on SMTP;
+    failed sends are retried with exponential backoff and end up in the dead-letter list.
+    """
+
+    def __init__(self, path: str = OUTBOX_DB, send=smtp_send):
+        self.path = path
+        self._send = send
+        # Shared by every session: the configured account until an admin saves new settings
+        settings = smtp_settings()
+        self._smtp_config = settings if settings["user"] else {}
+        # Owner digest: 0 minutes = off; otherwise held owner emails are flushed
+        # when the oldest is this old or digest_max_orders are waiting
+        self.digest_minutes = float(get_secret("OWNER_DIGEST_MINUTES", "0") or 0)
+        self.digest_max_orders = int(get_secret("OWNER_DIGEST_MAX_ORDERS", "20") or 20)
+        self._wakeup = threading.Event()
+        self._stopping = False
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            # Databases from before delivered messages were emptied
+            conn.execute("UPDATE outbox SET message = X'' WHERE status IN ('sent', 'digested') AND length(message) > 0")
+        self._thread = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+        self._thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def configure_smtp(self, server: str, port: int, user: str, password: str, starttls: bool = None):
+        """Replace the worker's SMTP settings (Admin Panel save); kept in memory only, never written to outbox.db."""
+        if starttls is None:
+            starttls = smtp_settings()["starttls"]
+        self._smtp_config = {"server": server, "port": int(port), "user": user, "password": password, "starttls": starttls}
+        self._wakeup.set()
+
+    def enqueue(self, kind: str, sender: str, recipients: list, message: bytes, meta: dict = None) -> int:
+        now = time.time()
+        with self._connect() as conn:
+            cur = conn.execute(
+                "INSERT INTO outbox (kind, sender, recipients, message, meta, next_attempt_at, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (kind, sender, json.dumps(recipients), message, json.dumps(meta or {}), now, now),
+            )
+        self._wakeup.set()
+        return cur.lastrowid
+
+    @property
+    def digest_enabled(self) -> bool:
+        return self.digest_minutes > 0
+
+    def configure_digest(self, minutes: float, max_orders: int):
+        self.digest_minutes = float(minutes)
+        self.digest_max_orders = max(1, int(max_orders))
+        self._wakeup.set()
+
+    def hold_for_digest(self, sender: str, recipient: str, pdf_bytes: bytes, meta: dict) -> int:
+        """Park an owner notification (just its receipt PDF and summary) until the next digest."""
+        now = time.time()
+        with self._connect() as conn:
+            cur = conn.execute(
+                "INSERT INTO outbox (kind, sender, recipients, message, meta, status, next_attempt_at, created_at)"
+                " VALUES ('owner_order', ?, ?, ?, ?, 'held', ?, ?)",
+                (sender, json.dumps([recipient]), pdf_bytes, json.dumps(meta), now, now),
+            )
+        self._wakeup.set()
+        return cur.lastrowid
+
+    def flush_digests(self, force: bool = False) -> int:
+        """Turn held owner emails into digest jobs when the window or count is reached; returns jobs created."""
+        with self._connect() as conn:
+            held = conn.execute(
+                "SELECT id, sender, recipients, message, meta, created_at FROM outbox WHERE status = 'held' ORDER BY id"
+            ).fetchall()
+        if not held:
+            return 0
+        due = (
+            force
+            or len(held) >= self.digest_max_orders
+            or time.time() - held[0]["created_at"] >= self.digest_minutes * 60
+        )
+        if not due:
+            return 0
+
+        groups = {}
+        for job in held:
+            groups.setdefault((job["sender"], job["recipients"]), []).append(job)
+
+        created = 0
+        for (sender, recipients), jobs in groups.items():
+            message = build_digest_message(sender, json.loads(recipients)[0], jobs)
+            order_ids = [json.loads(job["meta"] or "{}").get("order_id") for job in jobs]
+            now = time.time()
+            with self._connect() as conn:
+                # Mark first: if another process already digested any of these, back out
+                changed = sum(
+                    conn.execute("UPDATE outbox SET status = 'digested', message = X'' WHERE id = ? AND status = 'held'",
+                                 (job["id"],)).rowcount
+                    for job in jobs
+                )
+                if changed != len(jobs):
+                    conn.rollback()
+                    continue
+                conn.execute(
+                    "INSERT INTO outbox (kind, sender, recipients, message, meta, next_attempt_at, created_at)"
+                    " VALUES ('owner_digest', ?, ?, ?, ?, ?, ?)",
+                    (sender, recipients, message, json.dumps({"order_ids": order_ids}), now, now),
+                )
+            created += 1
+        return created
+
+    # ---- Admin Panel ----
+
+    def status_counts(self) -> dict:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def dead_letters(self, limit: int = 50) -> list:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, kind, recipients, meta, attempts, last_error, created_at FROM outbox"
+                " WHERE status = 'dead' ORDER BY id DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def retry_dead(self) -> int:
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = ? WHERE status = 'dead'",
+                (time.time(),),
+            )
+        self._wakeup.set()
+        return cur.rowcount
+
+    # ---- worker ----
+
+    def close(self, timeout: float = 10.0):
+        self._stopping = True
+        self._wakeup.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stopping:
+            try:
+                # Held owner emails are flushed even if digest mode was switched off meanwhile
+                self.flush_digests(force=not self.digest_enabled)
+                self.deliver_due()
+            except Exception as e:
+                print(f"ERROR: email outbox worker: {e}")
+            self._wakeup.wait(POLL_INTERVAL)
+            self._wakeup.clear()
+
+    def deliver_due(self) -> int:
+        """Try every job whose next attempt is due; returns how many were sent."""
+        if not self._smtp_config:
+            return 0
+        with self._connect() as conn:
+            jobs = conn.execute(
+                "SELECT id, sender, recipients, message, attempts FROM outbox"
+                " WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY id",
+                (time.time(),),
+            ).fetchall()
+
+        sent = 0
+        for job in jobs:
+            if self._stopping:
+                break
+            if not self._claim(job["id"]):
+                continue  # another process's worker got it first
+            try:
+                self._send(self._smtp_config, job["sender"], json.loads(job["recipients"]), job["message"])
+            except Exception as e:
+                self._mark_failed(job["id"], job["attempts"] + 1, str(e))
+            else:
+                with self._connect() as conn:
+                    # The row stays for the Admin Panel counts; the message (and its PDFs) isn't needed again
+                    conn.execute("UPDATE outbox SET status = 'sent', sent_at = ?, last_error = NULL, message = X'' WHERE id = ?",
+                                 (time.time(), job["id"]))
+                sent += 1
+        return sent
+
+    def _claim(self, job_id: int) -> bool:
+        now = time.time()
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE outbox SET next_attempt_at = ? WHERE id = ? AND status = 'pending' AND next_attempt_at <= ?",
+                (now + CLAIM_TIMEOUT, job_id, now),
+            )
+        return cur.rowcount == 1
+
+    def _mark_failed(self, job_id: int, attempts: int, error: str):
+        status = "dead" if attempts >= MAX_ATTEMPTS else "pending"
+        delay = min(BASE_BACKOFF * 2 ** (attempts - 1), MAX_BACKOFF)
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                (status, attempts, time.time() + delay, error, job_id),
+            )
+
+
+_outbox_lock = threading.Lock()
+_outbox = None
+
+
+def get_outbox() -> Outbox:
+    """Process-wide outbox; the worker stops on interpreter exit."""
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = Outbox()
+            atexit.register(_outbox.close)
+        return _outbox
+
+
+if __name__ == "__main__":
+    # python outbox.py   self-check against a local aiosmtpd server (pip install aiosmtpd):
+    # no password without STARTTLS, delivery, backoff while the server is down, dead-lettering and retry
+    import smtplib
+    import tempfile
+
+    from selfcheck import free_port, wait_for
+    from smtp_transport import SMTPTransport
+
+    try:
+        from aiosmtpd.controller import Controller
+        from aiosmtpd.handlers import Sink
+    except ImportError:
+        raise SystemExit("aiosmtpd is not installed: pip install aiosmtpd")
+
+    class Collect(Sink):
+        received = []
+
+        async def handle_DATA(self, server, session, envelope):
+            self.received.append(envelope.rcpt_tos)
+            return "250 OK"
+
+    MAX_ATTEMPTS = 2   # module global read by _mark_failed: dead-letter sooner
+    port, down_port = free_port(), free_port()
+    controller = Controller(Collect(), hostname="127.0.0.1", port=port)
+    controller.start()
+    outbox = Outbox(os.path.join(tempfile.mkdtemp(), "outbox.db"))
+    try:
+        message = b"Subject: outbox self-check\n\nHello"
+        try:   # aiosmtpd offers no STARTTLS: the password must not be sent
+            SMTPTransport("127.0.0.1", port, "shop@example.com", "app-password").send("shop@example.com", ["a@example.com"], message)
+            raise AssertionError("sent without STARTTLS")
+        except smtplib.SMTPNotSupportedError:
+            print("refused to log in without STARTTLS")
+
+        outbox.configure_smtp("127.0.0.1", port, "shop@example.com", "", starttls=False)
+        outbox.enqueue("customer_receipt", "shop@example.com", ["a@example.com"], message)
+        wait_for(lambda: outbox.status_counts().get("sent") == 1)
+        assert Collect.received == [["a@example.com"]]
+        print("delivered")
+
+        outbox.configure_smtp("127.0.0.1", down_port, "shop@example.com", "", starttls=False)
+        job = outbox.enqueue("customer_receipt", "shop@example.com", ["b@example.com"], message)
+        wait_for(lambda: outbox.status_counts().get("pending") == 1 and outbox._connect().execute(
+            "SELECT attempts FROM outbox WHERE id = ?", (job,)).fetchone()[0] == 1)
+        print("server down: job kept pending with backoff")
+
+        with outbox._connect() as conn:   # skip the backoff wait
+            conn.execute("UPDATE outbox SET next_attempt_at = 0 WHERE id = ?", (job,))
+        outbox._wakeup.set()
+        wait_for(lambda: outbox.status_counts().get("dead") == 1)
+        assert outbox.dead_letters()[0]["attempts"] == MAX_ATTEMPTS
+        print("dead-lettered after", MAX_ATTEMPTS, "attempts")
+
+        outbox.configure_smtp("127.0.0.1", port, "shop@example.com", "", starttls=False)
+        assert outbox.retry_dead() == 1
+        wait_for(lambda: outbox.status_counts().get("sent") == 2)
+        assert Collect.received[-1] == ["b@example.com"]
+        print("retried and delivered")
+
+        outbox.hold_for_digest("shop@example.com", "owner@example.com", b"%PDF-1.4 receipt", {"order_id": "20250101-0001"})
+        wait_for(lambda: outbox.status_counts().get("sent") == 3)   # digest mode is off: flushed at once
+        assert outbox._connect().execute(
+            "SELECT COUNT(*) FROM outbox WHERE status IN ('sent', 'digested') AND length(message) > 0").fetchone()[0] == 0
+        print("sent and digested rows keep no message body; self-check passed")
+    finally:
+        outbox.close()
+        controller.stop()
@@ -0,0 +1,239 @@
+import os
+import sqlite3
+import threading
+import time
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+PAYMENT_LINKS_DB = os.path.join(APP_DIR, "payment_links.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS payment_links (
+    id INTEGER PRIMARY KEY,
+    order_id TEXT NOT NULL,
+    amount_paise INTEGER NOT NULL,
+    link_id TEXT NOT NULL,
+    short_url TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'created',   -- Razorpay status: created | paid | cancelled | expired ...
+    attempt INTEGER NOT NULL DEFAULT 0,       -- bumped when a cancelled/expired link is replaced
+    created_at REAL NOT NULL,                 -- when the current link was created on Razorpay
+    updated_at REAL NOT NULL,
+    UNIQUE (order_id, amount_paise)
+);
+CREATE INDEX IF NOT EXISTS idx_payment_links_status ON payment_links(status);
+"""
+
+OPEN_STATUSES = ("created", "partially_paid")
+LINK_EXPIRY_MINUTES = 60      # sent as expire_by; Razorpay needs at least 15
+STALE_AFTER_MINUTES = LINK_EXPIRY_MINUTES + 15   # then an unpaid link is expired locally and no longer polled
+
+
+def reference_id(order_id: str, amount_paise: int, attempt: int = 0) -> str:
+    """Razorpay rejects a second link with the same reference_id, which makes creation idempotent."""
+    return f"{order_id}-{amount_paise}" + (f"-{attempt}" if attempt else "")
+
+
+class PaymentLinkManager:
+    """
+    At most one Razorpay payment link per (order ID, amount).
+    Links are remembered in payment_links.db, so reruns, sessions and processes reuse them;
+    when the bill total changes, the order's superseded unpaid links are cancelled.
+    """
+
+    def __init__(self, client, path: str = PAYMENT_LINKS_DB):
+        self.client = client
+        self.path = path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def get_or_create(self, order_id: str, amount_paise: int, customer: dict, description: str) -> dict:
+        """The link row for this order and amount, creating it on Razorpay only if none exists yet."""
+        with self._lock:
+            link = self.find(order_id, amount_paise)
+            if link is not None and (link["status"] == "paid" or link["status"] in OPEN_STATUSES and not self._past_expiry(link)):
+                return link
+            self.cancel_superseded(order_id, amount_paise)
+            attempt = 0 if link is None else link["attempt"] + 1
+            created = self._create_remote(order_id, amount_paise, attempt, customer, description)
+            now = time.time()
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT INTO payment_links (order_id, amount_paise, link_id, short_url, status, attempt, created_at, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT(order_id, amount_paise) DO UPDATE SET"
+                    " link_id = excluded.link_id, short_url = excluded.short_url, status = excluded.status,"
+                    " attempt = excluded.attempt, created_at = excluded.created_at, updated_at = excluded.updated_at",
+                    (order_id, amount_paise, created["id"], created["short_url"],
+                     created.get("status", "created"), attempt, now, now),
+                )
+            return self.find(order_id, amount_paise)
+
+    @staticmethod
+    def _past_expiry(link: dict) -> bool:
+        return time.time() >= link["created_at"] + LINK_EXPIRY_MINUTES * 60
+
+    def _create_remote(self, order_id: str, amount_paise: int, attempt: int, customer: dict, description: str) -> dict:
+        ref = reference_id(order_id, amount_paise, attempt)
+        try:
+            return self.client.payment_link.create({
+                "amount": amount_paise,
+                "currency": "INR",
+                "reference_id": ref,
+                "description": description,
+                "customer": customer,
+                "expire_by": int(time.time()) + LINK_EXPIRY_MINUTES * 60,
+            })
+        except Exception as e:
+            # Another process (or a crash before our insert) already created it
+            if "reference" not in str(e).lower():
+                raise
+            existing = self.client.payment_link.all({"reference_id": ref}).get("payment_links") or []
+            if not existing or existing[0].get("status") not in OPEN_STATUSES + ("paid",):
+                raise
+            return existing[0]
+
+    def cancel_superseded(self, order_id: str, keep_amount_paise: int = None) -> int:
+        """Cancel the order's unpaid links for any other amount; returns how many were cancelled."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT order_id, amount_paise, link_id FROM payment_links WHERE order_id = ?"
+                f" AND amount_paise IS NOT ? AND status IN ({', '.join('?' * len(OPEN_STATUSES))})",
+                (order_id, keep_amount_paise, *OPEN_STATUSES),
+            ).fetchall()
+        cancelled = 0
+        for row in rows:
+            try:
+                result = self.client.payment_link.cancel(row["link_id"])
+                status = result.get("status", "cancelled")
+            except Exception as e:
+                # Usually already paid or expired; left open here and retried on the next change
+                print(f"WARNING: could not cancel payment link {row['link_id']}: {e}")
+                continue
+            self.set_status(row["link_id"], status)
+            cancelled += 1
+        return cancelled
+
+    def find(self, order_id: str, amount_paise: int):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM payment_links WHERE order_id = ? AND amount_paise = ?", (order_id, amount_paise)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def find_link(self, link_id: str):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM payment_links WHERE link_id = ?", (link_id,)).fetchone()
+        return dict(row) if row else None
+
+    def open_links(self, limit: int, order_id: str = None) -> list:
+        """Unpaid links (only order_id's, if given), least recently checked first, for the reconciler."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM payment_links WHERE status IN ({', '.join('?' * len(OPEN_STATUSES))})"
+                " AND (? IS NULL OR order_id = ?) ORDER BY updated_at LIMIT ?",
+                (*OPEN_STATUSES, order_id, order_id, limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def expire_stale(self) -> list:
+        """
+        Mark unpaid links older than STALE_AFTER_MINUTES expired without asking Razorpay
+        (expire_by has closed them there), so they stop taking the poller's batches; returns them.
+        """
+        cutoff = time.time() - STALE_AFTER_MINUTES * 60
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM payment_links WHERE status IN ({', '.join('?' * len(OPEN_STATUSES))})"
+                " AND created_at < ?",
+                (*OPEN_STATUSES, cutoff),
+            ).fetchall()
+            # A webhook may have marked one paid in between: only still-open rows change
+            expired = [
+                dict(row, status="expired") for row in rows
+                if conn.execute(
+                    f"UPDATE payment_links SET status = 'expired', updated_at = ? WHERE link_id = ?"
+                    f" AND status IN ({', '.join('?' * len(OPEN_STATUSES))})",
+                    (time.time(), row["link_id"], *OPEN_STATUSES),
+                ).rowcount
+            ]
+        return expired
+
+    def has_open(self, order_id: str) -> bool:
+        with self._connect() as conn:
+            return conn.execute(
+                f"SELECT 1 FROM payment_links WHERE order_id = ? AND status IN ({', '.join('?' * len(OPEN_STATUSES))})",
+                (order_id, *OPEN_STATUSES),
+            ).fetchone() is not None
+
+    def count_open(self) -> int:
+        with self._connect() as conn:
+            return conn.execute(
+                f"SELECT COUNT(*) FROM payment_links WHERE status IN ({', '.join('?' * len(OPEN_STATUSES))})",
+                OPEN_STATUSES,
+            ).fetchone()[0]
+
+    def set_status(self, link_id: str, status: str):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE payment_links SET status = ?, updated_at = ? WHERE link_id = ?",
+                (status, time.time(), link_id),
+            )
+
+
+_manager_lock = threading.Lock()
+_managers = {}
+
+
+def get_payment_link_manager(client, path: str = PAYMENT_LINKS_DB) -> PaymentLinkManager:
+    """Process-wide manager per database file; takes the caller's latest client."""
+    with _manager_lock:
+        manager = _managers.get(path)
+        if manager is None:
+            manager = PaymentLinkManager(client, path)
+            _managers[path] = manager
+        manager.client = client   # app.py builds a new razorpay.Client on every rerun
+        return manager
+
+
+if __name__ == "__main__":
+    # python payment_links.py   self-check against fake_razorpay: create, duplicate reference,
+    # superseded links cancelled, recreate after a cancel
+    import tempfile
+
+    import razorpay
+
+    from fake_razorpay import FakeRazorpay
+
+    fake = FakeRazorpay().start()
+    manager = PaymentLinkManager(razorpay.Client(auth=("key", "secret"), base_url=fake.base_url),
+                                 os.path.join(tempfile.mkdtemp(), "payment_links.db"))
+    customer = {"name": "Asha", "email": "a@example.com", "contact": "9999999999"}
+
+    link = manager.get_or_create("20250101-0001", 12000, customer, "Payment for Order 20250101-0001")
+    assert manager.get_or_create("20250101-0001", 12000, customer, "again") == link
+    assert fake.creates() == 1
+    print("created once:", link["link_id"])
+
+    # A crash between Razorpay's create and our insert: the rejected reference is looked up instead
+    with manager._connect() as conn:
+        conn.execute("DELETE FROM payment_links")
+    assert manager.get_or_create("20250101-0001", 12000, customer, "retry")["link_id"] == link["link_id"]
+    assert fake.creates() == 2 and len(fake.links) == 1
+    print("duplicate reference recovered")
+
+    changed = manager.get_or_create("20250101-0001", 15000, customer, "bill changed")
+    assert fake.links[link["link_id"]]["status"] == "cancelled" and changed["link_id"] != link["link_id"]
+    print("superseded link cancelled")
+
+    assert manager.cancel_superseded("20250101-0001") == 1   # bill cleared / paid another way
+    assert not manager.has_open("20250101-0001")
+    again = manager.get_or_create("20250101-0001", 15000, customer, "recreated")
+    assert again["attempt"] == 1 and fake.links[again["link_id"]]["reference_id"] == "20250101-0001-15000-1"
+    print("recreated after cancel; self-check passed")
+    fake.stop()
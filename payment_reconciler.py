@@ -0,0 +1,261 @@
+import atexit
+import hashlib
+import hmac
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+POLL_INTERVAL = 30            # seconds between polling rounds
+BATCH_SIZE = 50               # open links checked per round, least recently checked first
+MAX_REQUESTS_PER_SECOND = 2   # stays well inside Razorpay's API rate limits
+MAX_BACKOFF = 10 * 60
+
+
+class RateLimiter:
+    """Token bucket: at most `rate` calls per second on average, bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens < 1:
+                time.sleep((1 - self._tokens) / self.rate)
+                self._last = time.monotonic()
+                self._tokens = 0.0
+            else:
+                self._tokens -= 1
+
+
+class PaymentReconciler:
+    """
+    Confirms Razorpay payments without the cashier checking by hand.
+    A daemon thread polls open payment links in rate-limited batches, and an optional
+    webhook receiver applies payment_link events as they arrive; both record the
+    result in the order store's order_payments table. Links past their expiry are
+    retired without API calls, and a poked order's links are checked before the batch.
+    """
+
+    def __init__(self, client, store, links, interval: float = POLL_INTERVAL,
+                 batch_size: int = BATCH_SIZE, max_per_second: float = MAX_REQUESTS_PER_SECOND):
+        self.client = client
+        self.store = store
+        self.links = links
+        self.interval = interval
+        self.batch_size = batch_size
+        self.limiter = RateLimiter(max_per_second)
+        self.last_poll = None
+        self.last_error = None
+        self.confirmed = 0
+        self._backoff = interval
+        self._poked = set()   # order IDs to check ahead of the batch
+        self._poked_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="payment-reconciler", daemon=True)
+            self._thread.start()
+
+    def close(self, timeout: float = 5.0):
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def poke(self, order_id: str = None):
+        """Check open links now rather than at the next interval; order_id's (e.g. after "Payment Done") go first."""
+        if order_id:
+            with self._poked_lock:
+                self._poked.add(order_id)
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stopping:
+            try:
+                self.poll_once()
+                self._backoff = self.interval
+            except Exception as e:
+                self.last_error = str(e)
+                self._backoff = min(self._backoff * 2, MAX_BACKOFF)
+                print(f"ERROR: payment reconciler: {e}")
+            self._wakeup.wait(self._backoff)
+            self._wakeup.clear()
+
+    def poll_once(self) -> int:
+        """
+        Fetch one batch of open links; returns how many turned out paid. Raises on API errors.
+        Poked orders are checked before the next link, even in the middle of a batch.
+        """
+        for link in self.links.expire_stale():
+            self.apply(link, {"status": "expired"})
+        batch = self.links.open_links(self.batch_size)
+        checked, paid = set(), 0
+        while not self._stopping:
+            order_id = self._next_poked()
+            if order_id is not None:
+                links = self.links.open_links(self.batch_size, order_id)
+            elif batch:
+                links = [batch.pop(0)]
+            else:
+                break
+            try:
+                for link in links:
+                    if order_id is None and link["link_id"] in checked:
+                        continue
+                    checked.add(link["link_id"])
+                    self.limiter.wait()
+                    if self.apply(link, self.client.payment_link.fetch(link["link_id"])):
+                        paid += 1
+            except Exception:
+                if order_id is not None:
+                    with self._poked_lock:   # first again once the backoff is over
+                        self._poked.add(order_id)
+                raise
+        self.last_poll = time.time()
+        self.last_error = None
+        return paid
+
+    def _next_poked(self):
+        with self._poked_lock:
+            return self._poked.pop() if self._poked else None
+
+    def apply(self, link: dict, entity: dict, payment_id: str = None) -> bool:
+        """Record a payment link's current Razorpay state; returns True if it is paid."""
+        status = entity.get("status", link["status"])
+        self.links.set_status(link["link_id"], status)
+        if status == "paid":
+            self.store.set_payment_status(
+                link["order_id"], "paid", method="Razorpay",
+                amount_paid=entity.get("amount_paid", link["amount_paise"]) / 100,
+                reference=payment_id or link["link_id"],
+            )
+            self.confirmed += 1
+            return True
+        if status in ("expired", "cancelled") and not self.links.has_open(link["order_id"]):
+            self.store.set_payment_status(link["order_id"], status, method="Razorpay", reference=link["link_id"])
+        return False
+
+    # ---- webhooks ----
+
+    def handle_webhook(self, body: bytes, signature: str, secret: str) -> bool:
+        """Apply a signed payment_link.* webhook; returns False if the signature doesn't match."""
+        expected = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(expected, signature or ""):
+            return False
+        event = json.loads(body)
+        payload = event.get("payload", {})
+        entity = payload.get("payment_link", {}).get("entity", {})
+        link = self.links.find_link(entity.get("id", ""))
+        if link is not None:
+            payment_id = payload.get("payment", {}).get("entity", {}).get("id")
+            self.apply(link, entity, payment_id)
+        return True
+
+    def status(self) -> dict:
+        return {
+            "open_links": self.links.count_open(),
+            "last_poll": self.last_poll,
+            "last_error": self.last_error,
+            "confirmed": self.confirmed,
+            "running": self._thread is not None and self._thread.is_alive(),
+        }
+
+
+def start_webhook_server(reconciler: PaymentReconciler, port: int, secret: str) -> ThreadingHTTPServer:
+    """POST endpoint for Razorpay webhooks (point the dashboard at http://<host>:<port>/)."""
+
+    class WebhookHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            try:
+                ok = reconciler.handle_webhook(body, self.headers.get("X-Razorpay-Signature", ""), secret)
+            except Exception as e:
+                print(f"ERROR: payment webhook: {e}")
+                ok = False
+            self.send_response(200 if ok else 400)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), WebhookHandler)
+    threading.Thread(target=server.serve_forever, name="payment-webhooks", daemon=True).start()
+    return server
+
+
+_reconciler_lock = threading.Lock()
+_reconciler = None
+
+
+def get_payment_reconciler(client, store, links, webhook_port: int = None, webhook_secret: str = None) -> PaymentReconciler:
+    """Process-wide reconciler; the polling thread (and webhook server, if configured) start on first use."""
+    global _reconciler
+    with _reconciler_lock:
+        if _reconciler is None:
+            _reconciler = PaymentReconciler(client, store, links)
+            _reconciler.start()
+            atexit.register(_reconciler.close)
+            if webhook_port and webhook_secret:
+                try:
+                    atexit.register(start_webhook_server(_reconciler, webhook_port, webhook_secret).shutdown)
+                except OSError as e:   # port already taken, e.g. by another app process
+                    print(f"WARNING: payment webhook receiver not started on port {webhook_port}: {e}")
+        _reconciler.client = client
+        return _reconciler
+
+
+if __name__ == "__main__":
+    # python payment_reconciler.py   self-check against fake_razorpay: stale links are retired
+    # without API calls, and a poked order is confirmed ahead of a long batch of open links
+    import os
+    import tempfile
+
+    import razorpay
+
+    from fake_razorpay import FakeRazorpay
+    from order_store import OrderStore
+    from payment_links import STALE_AFTER_MINUTES, PaymentLinkManager
+    from selfcheck import wait_for
+
+    fake = FakeRazorpay().start()
+    client = razorpay.Client(auth=("key", "secret"), base_url=fake.base_url)
+    tmp = tempfile.mkdtemp()
+    store = OrderStore(os.path.join(tmp, "orders.db"))
+    links = PaymentLinkManager(client, os.path.join(tmp, "payment_links.db"))
+    customer = {"name": "Asha", "email": "a@example.com", "contact": "9999999999"}
+
+    for i in range(200):
+        links.get_or_create(f"stale-{i}", 10000, customer, "never paid")
+    with links._connect() as conn:   # created before the cutoff, as if left over from yesterday
+        conn.execute("UPDATE payment_links SET created_at = created_at - ?", ((STALE_AFTER_MINUTES + 1) * 60,))
+    for i in range(200):
+        links.get_or_create(f"open-{i}", 10000, customer, "still payable")
+    fresh = links.get_or_create("fresh", 12000, customer, "paid just now")
+    fake.pay(fresh["link_id"])
+
+    reconciler = PaymentReconciler(client, store, links)
+    reconciler.start()
+    time.sleep(1)   # poke in the middle of the first batch
+    started = time.time()
+    reconciler.poke("fresh")
+    wait_for(lambda: store.payment_status("fresh") == "paid")
+    print(f"poked order confirmed in {time.time() - started:.1f} s with {links.count_open()} other links open")
+
+    fetched = {path.rsplit("/", 1)[1] for method, path in fake.calls if method == "GET"}
+    stale = {row[0] for row in links._connect().execute("SELECT link_id FROM payment_links WHERE order_id LIKE 'stale-%'")}
+    assert store.payment_status("stale-0") == "expired" and not stale & fetched
+    assert links.count_open() == 200   # the recent ones, polled over the next rounds
+    print(f"200 stale links expired without API calls ({len(fetched)} fetches so far); self-check passed")
+    reconciler.close()
+    fake.stop()
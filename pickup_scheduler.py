@@ -0,0 +1,203 @@
+import math
+import threading
+import time
+from datetime import datetime
+
+import pytz
+
+TIMEZONE = "Asia/Kolkata"
+SLOT_MINUTES = 10
+KITCHEN_COOKS = 2
+SLOT_CAPACITY = KITCHEN_COOKS * SLOT_MINUTES   # prep-minutes the kitchen can finish per slot
+OPEN_HOUR, CLOSE_HOUR = 10, 22                  # 10:00 AM – 10:00 PM
+HORIZON_SLOTS = 24 * 60 // SLOT_MINUTES         # look a day ahead: orders placed after closing go to the next opening
+MIN_LEAD_MINUTES = 10
+
+# Prep minutes per unit: first matching keyword in the item name, else the menu category, else the default
+ITEM_PREP_MINUTES = (
+    ("pizza", 12.0), ("biryani", 10.0), ("thali", 10.0), ("momo", 10.0), ("chowmin", 8.0), ("chumin", 8.0),
+    ("burger", 7.0), ("sandwich", 6.0), ("fries", 6.0), ("fires", 6.0), ("wrap", 6.0), ("patty", 3.0),
+)
+CATEGORY_PREP_MINUTES = {"Fast Food": 8.0, "Bakery": 1.0, "Snacks": 0.5, "Drinks": 0.5}
+DEFAULT_PREP_MINUTES = 5.0
+
+
+def prep_minutes(item: str, category: str = None) -> float:
+    name = item.lower()
+    for keyword, minutes in ITEM_PREP_MINUTES:
+        if keyword in name:
+            return minutes
+    return CATEGORY_PREP_MINUTES.get(category, DEFAULT_PREP_MINUTES)
+
+
+def order_prep(lines, categories: dict = None) -> tuple:
+    """(total prep-minutes, longest single item) for bill lines [{"item", "quantity", ...}]."""
+    categories = categories or {}
+    per_item = [(prep_minutes(ln["item"], categories.get(ln["item"])), int(ln["quantity"])) for ln in lines]
+    return sum(minutes * qty for minutes, qty in per_item), max((minutes for minutes, _ in per_item), default=0.0)
+
+
+class PickupScheduler:
+    """
+    In-memory pickup slot table shared by every session in the process.
+    Each SLOT_MINUTES slot holds the prep-minutes the kitchen works on in it. An order
+    takes the earliest run of ceil(weight / capacity) consecutive open slots with room for
+    it, filling them in order, and is promised ready at the end of the last one. Lookups
+    are dict hits and searches are bounded by HORIZON_SLOTS; one lock makes
+    check-and-reserve atomic across sessions.
+    """
+
+    def __init__(self, capacity: float = SLOT_CAPACITY, slot_minutes: int = SLOT_MINUTES, clock=time.time):
+        self.capacity = capacity
+        self.slot_seconds = slot_minutes * 60
+        self.clock = clock
+        self.tz = pytz.timezone(TIMEZONE)
+        # India has no DST: one offset turns a slot into its local time of day without datetime calls
+        self._utc_offset = int(datetime.now(self.tz).utcoffset().total_seconds())
+        self._lock = threading.Lock()
+        self._load = {}     # slot index -> committed prep-minutes
+        self._orders = {}   # order_id -> [(slot index, prep-minutes), ...] in slot order
+
+    def _slot(self, ts: float) -> int:
+        return int(ts // self.slot_seconds)
+
+    def slot_end(self, slot: int) -> float:
+        """Promised ready time for a slot."""
+        return (slot + 1) * self.slot_seconds
+
+    def _is_open(self, slot: int) -> bool:
+        start = (slot * self.slot_seconds + self._utc_offset) % 86400
+        return OPEN_HOUR * 3600 <= start and start + self.slot_seconds <= CLOSE_HOUR * 3600
+
+    def _find(self, weight: float, not_before: float, not_after: float = None):
+        """[(slot, prep-minutes), ...] for the earliest run that is ready from not_before on, or None."""
+        now = self.clock()
+        count = max(1, math.ceil(weight / self.capacity - 1e-9))
+        # Cooking may start before not_before as long as it starts after the lead time
+        first = max(self._slot(not_before), self._slot(now + MIN_LEAD_MINUTES * 60) + count - 1)
+        last = self._slot(now) + HORIZON_SLOTS
+        if not_after is not None:
+            last = min(last, self._slot(not_after - 1))
+        for ready in range(first, last + 1):
+            run = range(ready - count + 1, ready + 1)
+            room = [self.capacity - self._load.get(slot, 0.0) for slot in run]
+            if sum(room) >= weight - 1e-9 and all(self._is_open(slot) for slot in run):
+                parts, left = [], weight
+                for slot, free in zip(run, room):
+                    part = min(max(free, 0.0), left) if slot != ready else left
+                    if part > 0 or slot == ready:
+                        parts.append((slot, part))
+                    left -= part
+                return parts
+        return None
+
+    def quote(self, weight: float, not_before: float, not_after: float = None):
+        """Earliest promised ready time (epoch seconds) in the window, or None if it is full or closed."""
+        with self._lock:
+            parts = self._find(weight, not_before, not_after)
+        return None if parts is None else self.slot_end(parts[-1][0])
+
+    def reserve(self, order_id: str, weight: float, not_before: float):
+        """
+        Commit an order to the earliest slots with room from not_before on, deferring past full
+        slots; returns the promised ready time, or None when nothing is left before closing.
+        Reserving the same order again replaces its earlier slots.
+        """
+        with self._lock:
+            self._release(order_id)
+            self._prune()
+            parts = self._find(weight, not_before)
+            if parts is None:
+                return None
+            for slot, part in parts:
+                self._load[slot] = self._load.get(slot, 0.0) + part
+            self._orders[order_id] = parts
+        return self.slot_end(parts[-1][0])
+
+    def release(self, order_id: str):
+        with self._lock:
+            self._release(order_id)
+
+    def _release(self, order_id: str):
+        for slot, part in self._orders.pop(order_id, ()):
+            load = self._load.get(slot, 0.0) - part
+            if load > 1e-9:
+                self._load[slot] = load
+            else:
+                self._load.pop(slot, None)
+
+    def _prune(self):
+        """Drop slots (and orders whose last slot) that have already passed."""
+        current = self._slot(self.clock())
+        for slot in [s for s in self._load if s < current]:
+            del self._load[slot]
+        for order_id in [o for o, parts in self._orders.items() if parts[-1][0] < current]:
+            del self._orders[order_id]
+
+    def promised(self, order_id: str):
+        with self._lock:
+            held = self._orders.get(order_id)
+        return None if held is None else self.slot_end(held[-1][0])
+
+    def upcoming(self, count: int = 6) -> list:
+        """(ready time, prep-minutes booked, orders worked on) for the next count slots, for the admin."""
+        current = self._slot(self.clock())
+        with self._lock:
+            orders = {}
+            for parts in self._orders.values():
+                for slot, _ in parts:
+                    orders[slot] = orders.get(slot, 0) + 1
+            return [
+                (self.slot_end(slot), self._load.get(slot, 0.0), orders.get(slot, 0))
+                for slot in range(current, current + count)
+            ]
+
+
+_scheduler_lock = threading.Lock()
+_scheduler = None
+
+
+def get_pickup_scheduler(capacity: float = SLOT_CAPACITY) -> PickupScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = PickupScheduler(capacity)
+        return _scheduler
+
+
+if __name__ == "__main__":
+    # python pickup_scheduler.py   a lunch rush reserved from many threads, a party order, then quote latency
+    from concurrent.futures import ThreadPoolExecutor
+
+    tz = pytz.timezone(TIMEZONE)
+    lunch = datetime.now(tz).replace(hour=13, minute=0, second=0, microsecond=0).timestamp()
+    started = time.time()
+    scheduler = PickupScheduler(clock=lambda: lunch + time.time() - started)
+
+    items = ["7 Inch Pizza Corn", "Frooti20", "Paneer Patty", "Burger Aloo tikki"]
+    # Booked ahead: 10 pizzas are 120 prep-minutes, six full slots in a row, ready at the end of the last
+    party = order_prep([{"item": "7 Inch Pizza Corn", "quantity": 10}])[0]
+    party_ready = scheduler.reserve("party", party, scheduler.clock() + 3600)
+    orders = [(f"order-{i}", order_prep([{"item": items[i % 4], "quantity": 1 + i % 2}])[0]) for i in range(200)]
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        promised = list(pool.map(lambda o: scheduler.reserve(o[0], o[1], scheduler.clock()), orders))
+
+    party_slots = [slot for slot, _ in scheduler._orders["party"]]
+    assert len(party_slots) == 6 and party_slots == list(range(party_slots[0], party_slots[0] + 6))
+    assert party_ready == scheduler.slot_end(party_slots[-1]) == scheduler.promised("party")
+
+    upcoming = scheduler.upcoming(HORIZON_SLOTS + 1)
+    assert all(load <= scheduler.capacity + 1e-9 for _, load, _ in upcoming)
+    accepted = [p for p in promised if p]
+    booked = sum(w for (_, w), p in zip(orders, promised) if p) + party
+    assert abs(sum(load for _, load, _ in upcoming) - booked) < 1e-6
+    scheduler.release("party")
+    assert abs(sum(load for _, load, _ in scheduler.upcoming(HORIZON_SLOTS + 1)) - booked + party) < 1e-6
+
+    t0 = time.perf_counter()
+    for _ in range(10_000):
+        scheduler.quote(8.0, scheduler.clock())
+    quote_us = (time.perf_counter() - t0) / 10_000 * 1e6
+    print(f"{len(accepted)}/{len(orders)} orders promised across {len(set(accepted))} slots,"
+          f" last ready after {(max(accepted) - scheduler.clock()) / 60:.0f} min; party order over {len(party_slots)} slots,"
+          f" ready after {(party_ready - scheduler.clock()) / 60:.0f} min; quote {quote_us:.1f} µs")
@@ -0,0 +1,234 @@
+import socket
+import textwrap
+from dataclasses import dataclass
+
+SHOP_NAME = "Dhaliwals Food Court"
+SHOP_LINES = (
+    "Unit of Param Mehar Enterprise Prop Pushpinder Singh Dhaliwal",
+    "Meerut, UP | Ph: +91-9259317713",
+)
+THANK_YOU = "Thank you for visiting!"
+
+ESCPOS_COLUMNS = 48   # Font A on 80 mm paper (576 dots / 12)
+
+
+@dataclass(frozen=True, slots=True)
+class Row:
+    """
+    One logical receipt line; each backend decides how to wrap and style it.
+    kind: logo | title | text | rule | field (label: value) | heading | item | amount
+    """
+    kind: str
+    left: str = ""
+    right: str = ""
+    style: str = "normal"     # normal | small | bold | italic
+    align: str = "left"       # left | center
+    section: str = "header"   # header | order | customer | items | totals | footer
+
+
+def money(amount: float) -> str:
+    return f"₹{amount:.2f}"
+
+
+def build_receipt_layout(receipt: dict) -> tuple:
+    """
+    Receipt rows from plain receipt data: order_id, bill_time, customer, phone, email,
+    address, payment_method, optional pickup_time, lines [{"quantity", "item", "size", "amount"}] and totals
+    {"subtotal", "delivery_charge", "gst_rate", "gst_amount", "razorpay_fee", "discount", "grand_total"}.
+    """
+    totals = receipt["totals"]
+    rows = [
+        Row("logo"),
+        Row("title", SHOP_NAME, align="center"),
+        *(Row("text", line, style="small", align="center") for line in SHOP_LINES),
+        Row("rule"),
+        Row("field", "Bill Time", receipt["bill_time"], section="order"),
+        Row("field", "Order ID", receipt["order_id"], section="order"),
+        *([Row("field", "Pickup By", receipt["pickup_time"], section="order")] if receipt.get("pickup_time") else []),
+        Row("field", "Customer", receipt["customer"], section="customer"),
+        Row("field", "Phone", receipt["phone"], section="customer"),
+        Row("field", "Email", receipt["email"], section="customer"),
+        Row("field", "Address", receipt["address"], section="customer"),
+        Row("field", "Payment Method", receipt["payment_method"], section="customer"),
+        Row("rule", section="customer"),
+        Row("heading", "Items", "Price", style="bold", section="items"),
+        *(
+            Row("item", f"{line['quantity']}x {line['item']} ({line['size']})", money(line["amount"]), section="items")
+            for line in receipt["lines"]
+        ),
+        Row("rule", section="items"),
+        Row("amount", "Subtotal", money(totals["subtotal"]), style="bold", section="totals"),
+        Row("amount", "Delivery Charge", money(totals["delivery_charge"]), style="bold", section="totals"),
+        Row("amount", f"GST ({totals['gst_rate']}%)", money(totals["gst_amount"]), style="bold", section="totals"),
+    ]
+    if totals["razorpay_fee"] > 0:
+        rows.append(Row("amount", "Razorpay Fee", money(totals["razorpay_fee"]), style="bold", section="totals"))
+    rows += [
+        Row("amount", "Discount", "-" + money(totals["discount"]), style="bold", section="totals"),
+        Row("amount", "Grand Total", money(totals["grand_total"]), style="bold", section="totals"),
+        Row("text", THANK_YOU, style="italic", align="center", section="footer"),
+    ]
+    return tuple(rows)
+
+
+# ---- plain text (WhatsApp) ----
+
+def render_text(layout: tuple, sections: tuple = None) -> str:
+    """WhatsApp-style text (*bold* labels); sections limits which parts are included."""
+    out = []
+    for row in layout:
+        if sections is not None and row.section not in sections:
+            continue
+        if row.kind == "rule":
+            if out and out[-1] != "":
+                out.append("")
+        elif row.kind in ("field", "amount"):
+            out.append(f"*{row.left}:* {row.right}")
+        elif row.kind == "heading":
+            out.append(f"*{row.left}:*")
+        elif row.kind == "item":
+            out.append(f"- {row.left}: {row.right}")
+        elif row.kind == "title" or row.style == "bold":
+            out.append(f"*{row.left}*")
+        elif row.kind == "text":
+            out.append(row.left)
+    return "\n".join(out).strip()
+
+
+# ---- ESC/POS (counter thermal printer) ----
+
+ESC, GS = b"\x1b", b"\x1d"
+ESCPOS_INIT = ESC + b"@" + ESC + b"t\x00"   # reset, code page PC437
+ALIGN = {"left": ESC + b"a\x00", "center": ESC + b"a\x01"}
+BOLD_ON, BOLD_OFF = ESC + b"E\x01", ESC + b"E\x00"
+DOUBLE_ON, DOUBLE_OFF = GS + b"!\x11", GS + b"!\x00"
+FEED_AND_CUT = ESC + b"d\x04" + GS + b"V\x00"
+
+
+def _ascii(text: str) -> str:
+    # Printer code pages have no ₹ sign; swapped before wrapping so columns stay aligned
+    return text.replace("₹", "Rs.")
+
+
+def _printable(text: str) -> bytes:
+    return text.encode("cp437", "replace")
+
+
+def _columns(left: str, right: str, width: int) -> list:
+    """Left text wrapped so the right-aligned value fits on its first line."""
+    wrapped = textwrap.wrap(left, max(8, width - len(right) - 1)) or [""]
+    first = wrapped[0].ljust(width - len(right)) + right
+    return [first] + wrapped[1:]
+
+
+def render_escpos(layout: tuple, columns: int = ESCPOS_COLUMNS) -> bytes:
+    """Raw ESC/POS byte stream for an 80 mm thermal printer, ending with a paper cut."""
+    out = [ESCPOS_INIT]
+    for row in layout:
+        if row.kind == "logo":
+            continue
+        out.append(ALIGN[row.align])
+        if row.kind == "title":
+            out += [DOUBLE_ON, _printable(_ascii(row.left)[: columns // 2]), b"\n", DOUBLE_OFF]
+            continue
+        if row.kind == "rule":
+            out.append(b"-" * columns + b"\n")
+            continue
+
+        left, right = _ascii(row.left), _ascii(row.right)
+        if row.kind == "field":
+            lines = textwrap.wrap(f"{left}: {right}", columns)
+        elif row.kind in ("heading", "item", "amount"):
+            lines = _columns(left, right, columns)
+        else:
+            lines = textwrap.wrap(left, columns)
+        bold = row.style == "bold"
+        out += [BOLD_ON if bold else b""] + [_printable(line) + b"\n" for line in lines] + [BOLD_OFF if bold else b""]
+    out += [ALIGN["left"], FEED_AND_CUT]
+    return b"".join(out)
+
+
+def send_to_printer(data: bytes, target: str, timeout: float = 5.0):
+    """
+    Write an ESC/POS job to a printer: "host:port" for a network printer (usually port 9100),
+    otherwise a device or file path such as /dev/usb/lp0.
+    """
+    host, sep, port = target.rpartition(":")
+    if sep and port.isdigit():
+        with socket.create_connection((host, int(port)), timeout=timeout) as sock:
+            sock.sendall(data)
+    else:
+        with open(target, "ab") as f:
+            f.write(data)
+
+
+def _sample_receipt() -> dict:
+    return {
+        "order_id": "20260101-0001",
+        "bill_time": "01 Jan 2026 12:00:00",
+        "customer": "Asha", "phone": "919999999999", "email": "a@b.c", "address": "Meerut",
+        "payment_method": "Cash on Delivery",
+        "lines": [{"quantity": 2, "item": f"Veg Special Thali with Paneer {i}", "size": "Full", "amount": 80.0}
+                  for i in range(6)],
+        "totals": {"subtotal": 480.0, "delivery_charge": 0.0, "gst_rate": 0.0, "gst_amount": 0.0,
+                   "razorpay_fee": 0.0, "discount": 0.0, "grand_total": 480.0},
+    }
+
+
+def _check_printer():
+    """send_to_printer against a throwaway TCP printer on 127.0.0.1 and a temp file: the job arrives intact."""
+    import os
+    import socketserver
+    import tempfile
+    import threading
+
+    from selfcheck import wait_for
+
+    data = render_escpos(build_receipt_layout(_sample_receipt()))
+    received = []
+
+    class Printer(socketserver.StreamRequestHandler):
+        def handle(self):
+            received.append(self.rfile.read())   # until the sender closes the connection
+
+    with socketserver.TCPServer(("127.0.0.1", 0), Printer) as server:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        send_to_printer(data, f"127.0.0.1:{server.server_address[1]}")
+        wait_for(lambda: received)
+        server.shutdown()
+
+    path = os.path.join(tempfile.mkdtemp(), "lp0")
+    send_to_printer(data, path)
+    with open(path, "rb") as f:
+        written = f.read()
+
+    for label, job in (("socket", received[0]), ("file", written)):
+        assert job == data and job.startswith(ESC + b"@") and job.endswith(GS + b"V\x00"), label
+        print(f"{label}: {len(job)} bytes intact, ESC @ ... cut")
+
+
+def _benchmark(runs: int = 50):
+    import time
+
+    from receipt_pdf import render_receipt_pdf
+
+    receipt = _sample_receipt()
+    render_receipt_pdf(receipt)   # warm font and logo caches
+
+    print(f"{'':<10}{'ms/receipt':>12}{'bytes':>10}")
+    for label, fn in [
+        ("text", lambda: render_text(build_receipt_layout(receipt))),
+        ("escpos", lambda: render_escpos(build_receipt_layout(receipt))),
+        ("pdf", lambda: render_receipt_pdf(receipt)),
+    ]:
+        start = time.perf_counter()
+        for _ in range(runs):
+            data = fn()
+        ms = (time.perf_counter() - start) / runs * 1000
+        print(f"{label:<10}{ms:>12.3f}{len(data):>10}")
+
+
+if __name__ == "__main__":
+    # python receipt_layout.py   ESC/POS delivery check, then render time per backend
+    _check_printer()
+    _benchmark()
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from PIL import Image
+
+from receipt_layout import Row, build_receipt_layout
+
+try:
+    from reportlab.lib.units import mm as MM
+    from reportlab.lib.utils import ImageReader, simpleSplit
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
+except ImportError:  # app.py reports the missing dependency
+    canvas = None
+    MM = 1
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+FONT_PATH = os.path.join(APP_DIR, "DejaVuSans.ttf")
+LOGO_PATH = os.path.join(APP_DIR, "Dhaliwal Food court_logo.png")
+
+LOGO_PX = 240          # 20 mm at ~300 dpi; the source logo is 1024 px
+PDF_CACHE_SIZE = 64    # finished receipts kept in memory
+
+_font_lock = threading.Lock()
+_fonts = None          # (regular, bold, error)
+_logo_lock = threading.Lock()
+_logos = {}            # (path, mtime_ns, max_px) -> ImageReader
+_pdf_lock = threading.Lock()
+_pdf_cache = OrderedDict()
+
+
+def receipt_fonts():
+    """
+    Register DejaVuSans (for the ₹ sign) once per process.
+    Returns (regular, bold, error); falls back to Helvetica with the error message.
+    """
+    global _fonts
+    with _font_lock:
+        if _fonts is None:
+            try:
+                pdfmetrics.registerFont(TTFont("DejaVuSans", FONT_PATH))
+                # Using regular for bold as well, as bold version might not be available
+                _fonts = ("DejaVuSans", "DejaVuSans", None)
+            except Exception as e:
+                _fonts = ("Helvetica", "Helvetica-Bold", str(e))
+        return _fonts
+
+
+def logo_reader(path: str = LOGO_PATH, max_px: int = LOGO_PX):
+    """Downscaled logo as a reusable ImageReader, rebuilt only when the file changes."""
+    try:
+        key = (path, os.stat(path).st_mtime_ns, max_px)
+    except OSError:
+        return None
+    with _logo_lock:
+        reader = _logos.get(key)
+        if reader is None:
+            with Image.open(path) as im:
+                im.thumbnail((max_px, max_px))
+                im = im.convert("RGB")
+            reader = ImageReader(im)
+            _logos.clear()
+            _logos[key] = reader
+        return reader
+
+
+def receipt_key(receipt: dict) -> tuple:
+    """(order_id, hash of everything printed except the bill time)."""
+    content = {k: v for k, v in receipt.items() if k != "bill_time"}
+    digest = hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return receipt["order_id"], digest
+
+
+# points per row: font size and line height by row style
+PDF_STYLES = {
+    "title": (10, 12),
+    "small": (4, 6),
+    "normal": (8, 10),
+    "bold": (8, 10),
+    "italic": (8, 14),
+}
+PDF_MARGIN = 2
+PDF_TOP, PDF_BOTTOM = 6, 10
+RULE_GAP = 8
+
+
+def _pdf_lines(row: Row, font: str, size: int, width: float) -> list:
+    """[(left, right)] for a row: text wraps to the page width instead of being truncated."""
+    if row.kind == "field":
+        return [(line, "") for line in simpleSplit(f"{row.left}: {row.right}", font, size, width)]
+    if row.kind in ("heading", "item", "amount"):
+        right_width = pdfmetrics.stringWidth(row.right, font, size)
+        wrapped = simpleSplit(row.left, font, size, width - right_width - 6) or [""]
+        return [(wrapped[0], row.right)] + [(line, "") for line in wrapped[1:]]
+    return [(line, "") for line in simpleSplit(row.left, font, size, width)]
+
+
+def render_receipt_pdf(receipt: dict, fonts=None, logo=None) -> bytes:
+    """80 mm thermal receipt PDF; the page is exactly as tall as the laid-out rows."""
+    font, font_bold, _ = fonts or receipt_fonts()
+    logo = logo or logo_reader()
+    thermal_width = 80 * MM
+    text_width = thermal_width - 2 * PDF_MARGIN
+
+    # Measure first, so the page height fits the content
+    placed = []
+    height = PDF_TOP
+    for row in build_receipt_layout(receipt):
+        if row.kind in ("logo", "rule"):
+            placed.append((row, None, None, None))
+            height += RULE_GAP if row.kind == "rule" else 0
+            continue
+        style = "title" if row.kind == "title" else row.style
+        size, leading = PDF_STYLES[style]
+        face = {"bold": font_bold, "title": font_bold, "italic": "Helvetica-Oblique"}.get(style, font)
+        lines = _pdf_lines(row, face, size, text_width)
+        placed.append((row, face, size, (leading, lines)))
+        height += leading * len(lines)
+    thermal_height = max(height + PDF_BOTTOM, 10 * MM + PDF_TOP + PDF_BOTTOM)
+
+    buf = BytesIO()
+    c = canvas.Canvas(buf, pagesize=(thermal_width, thermal_height))
+    y = thermal_height - PDF_TOP
+    for row, face, size, text in placed:
+        if row.kind == "logo":
+            if logo is not None:
+                logo_y = y - 10 * MM
+                c.drawImage(logo, 2 * MM, logo_y, width=20 * MM, height=10 * MM)
+                c.drawImage(logo, thermal_width - 22 * MM, logo_y, width=20 * MM, height=10 * MM)
+            continue
+        if row.kind == "rule":
+            y -= RULE_GAP
+            c.line(0, y, thermal_width, y)
+            continue
+        leading, lines = text
+        c.setFont(face, size)
+        for left, right in lines:
+            y -= leading
+            if row.align == "center":
+                c.drawCentredString(thermal_width / 2, y, left)
+            else:
+                c.drawString(PDF_MARGIN, y, left)
+            if right:
+                c.drawRightString(thermal_width - PDF_MARGIN, y, right)
+
+    c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def receipt_pdf_bytes(receipt: dict) -> bytes:
+    """
+    Finished PDF for a receipt, memoized per (order_id, bill hash): reruns, the download
+    button and the email sends all reuse the first render (and its bill time).
+    """
+    key = receipt_key(receipt)
+    with _pdf_lock:
+        data = _pdf_cache.get(key)
+        if data is not None:
+            _pdf_cache.move_to_end(key)
+            return data
+    data = render_receipt_pdf(receipt)
+    with _pdf_lock:
+        _pdf_cache[key] = data
+        while len(_pdf_cache) > PDF_CACHE_SIZE:
+            _pdf_cache.popitem(last=False)
+    return data
+
+
+def _benchmark(runs: int = 20):
+    import time
+
+    receipt = {
+        "order_id": "20260101-0001",
+        "bill_time": "01 Jan 2026 12:00:00",
+        "customer": "Asha", "phone": "919999999999", "email": "a@b.c", "address": "Meerut",
+        "payment_method": "Cash on Delivery",
+        "lines": [{"quantity": 2, "item": f"Item {i}", "size": "Full", "amount": 80.0} for i in range(6)],
+        "totals": {"subtotal": 480.0, "delivery_charge": 0.0, "gst_rate": 0.0, "gst_amount": 0.0,
+                   "razorpay_fee": 0.0, "discount": 0.0, "grand_total": 480.0},
+    }
+
+    def before():
+        # What build_pdf_receipt used to do: parse the TTF and decode the full-size logo per call
+        pdfmetrics.registerFont(TTFont("DejaVuSans", FONT_PATH))
+        return render_receipt_pdf(receipt, fonts=("DejaVuSans", "DejaVuSans", None), logo=LOGO_PATH)
+
+    def timed(fn):
+        start = time.perf_counter()
+        for _ in range(runs):
+            data = fn()
+        return (time.perf_counter() - start) / runs * 1000, len(data)
+
+    print(f"{'':<28}{'ms/receipt':>12}{'bytes':>10}")
+    for label, fn in [
+        ("before (per-call setup)", before),
+        ("cached font + logo", lambda: render_receipt_pdf(receipt)),
+        ("memoized (rerun/email)", lambda: receipt_pdf_bytes(receipt)),
+    ]:
+        ms, size = timed(fn)
+        print(f"{label:<28}{ms:>12.2f}{size:>10}")
+
+
+if __name__ == "__main__":
+    # python receipt_pdf.py   per-receipt time and size, before/after caching
+    _benchmark()
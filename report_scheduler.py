@@ -0,0 +1,160 @@
+import atexit
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import pytz
+import schedule
+
+try:
+    import fcntl
+except ImportError:  # Windows: only one scheduler per process is guaranteed
+    fcntl = None
+
+from smtp_transport import get_secret
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+LAST_RUN_FILE = os.path.join(APP_DIR, "last_run_date.txt")
+LOCK_FILE = os.path.join(APP_DIR, "report.lock")
+
+TIMEZONE = "Asia/Kolkata"
+RETRY_MINUTES = 15   # re-check for failed or missed reports this often
+CATCHUP_DAYS = 3     # never send more than this many missed reports at once
+
+
+def read_last_run_date(path: str = LAST_RUN_FILE):
+    try:
+        with open(path, "r") as f:
+            return date.fromisoformat(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def write_last_run_date(d: date, path: str = LAST_RUN_FILE):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(d.isoformat())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def due_days(now: datetime, send_time: str, last_run, catchup_days: int = CATCHUP_DAYS) -> list:
+    """Days whose report is due at `now` but not yet sent, oldest first."""
+    hour, minute = map(int, send_time.split(":"))
+    latest = now.date()
+    if now < now.replace(hour=hour, minute=minute, second=0, microsecond=0):
+        latest -= timedelta(days=1)
+    if last_run is None:
+        return [latest]
+    first = max(last_run + timedelta(days=1), latest - timedelta(days=catchup_days - 1))
+    return [first + timedelta(days=i) for i in range((latest - first).days + 1)]
+
+
+class ReportScheduler:
+    """
+    Sends the end-of-day orders report from a daemon thread at SEND_TIME (IST),
+    whether or not anyone has the app open. Every process may run one; an exclusive
+    lock on report.lock plus last_run_date.txt make each day go out exactly once,
+    and days missed while the app was down are caught up on the next check.
+    """
+
+    def __init__(self, send_report, send_time: str = "23:30",
+                 last_run_file: str = LAST_RUN_FILE, lock_file: str = LOCK_FILE):
+        self.send_report = send_report   # callable(day: date) -> bool
+        self.send_time = send_time
+        self.last_run_file = last_run_file
+        self.lock_file = lock_file
+        self.last_attempt = None
+        self.last_error = None
+        self._run_lock = threading.Lock()
+        self._scheduler = schedule.Scheduler()
+        self._daily_job = self._scheduler.every().day.at(send_time, TIMEZONE).do(self.run_due)
+        self._scheduler.every(RETRY_MINUTES).minutes.do(self.run_due)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="report-scheduler", daemon=True)
+            self._thread.start()
+
+    def close(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        self.run_due()   # catch up straight away rather than waiting for the first tick
+        while not self._stop.wait(min(max(self._scheduler.idle_seconds or 30, 1), 30)):
+            self._scheduler.run_pending()
+
+    def run_due(self) -> list:
+        """Send every due report not yet sent by any process; returns the days sent."""
+        sent = []
+        with self._run_lock, open(self.lock_file, "a") as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return sent   # another process is sending right now
+            try:
+                now = datetime.now(pytz.timezone(TIMEZONE))
+                for day in due_days(now, self.send_time, read_last_run_date(self.last_run_file)):
+                    self.last_attempt = now
+                    try:
+                        ok = self.send_report(day)
+                        self.last_error = None if ok else "report was not sent"
+                    except Exception as e:
+                        ok = False
+                        self.last_error = str(e)
+                    if not ok:
+                        print(f"ERROR: end-of-day report for {day}: {self.last_error}")
+                        break   # keep the day due; retried on the next check
+                    write_last_run_date(day, self.last_run_file)
+                    sent.append(day)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+        return sent
+
+    def status(self) -> dict:
+        """For the Admin Panel: last day sent (by any process), next run, last error."""
+        next_run = self._daily_job.next_run   # naive, server-local
+        return {
+            "last_sent": read_last_run_date(self.last_run_file),
+            "last_attempt": self.last_attempt,
+            "last_error": self.last_error,
+            "next_run": next_run.astimezone(pytz.timezone(TIMEZONE)) if next_run else None,
+            "running": self._thread is not None and self._thread.is_alive(),
+        }
+
+
+_scheduler_lock = threading.Lock()
+_report_scheduler = None
+
+
+def get_report_scheduler(send_time: str = None) -> ReportScheduler:
+    """Process-wide scheduler, started on first use and stopped on interpreter exit."""
+    global _report_scheduler
+    with _scheduler_lock:
+        if _report_scheduler is None:
+            from send_mail import send_daily_orders_email
+            _report_scheduler = ReportScheduler(
+                send_daily_orders_email, send_time or get_secret("SEND_TIME", "23:30") or "23:30"
+            )
+            _report_scheduler.start()
+            atexit.register(_report_scheduler.close)
+        return _report_scheduler
+
+
+if __name__ == "__main__":
+    # python report_scheduler.py   run the end-of-day scheduler on its own (e.g. as a service)
+    scheduler = get_report_scheduler()
+    print(f"End-of-day report scheduled daily at {scheduler.send_time} ({TIMEZONE})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        scheduler.close()
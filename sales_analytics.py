@@ -0,0 +1,181 @@
+import pandas as pd
+
+from order_store import ITEM_RE
+
+# Legacy rows are free text typed at the counter: "Pastry+Frooti", "Patty + 4 Pastry +4 Paneer Patty", "7 Pizza*3"
+LEGACY_SPLIT = r"\s*[+,&/]\s*"
+LEGACY_TRAILING_QTY = r"^(?P<name>.*?\S)\s*[x*]\s*(?P<qty>\d+)$"
+LEGACY_LEADING_QTY = r"(?i)^(?P<qty>\d+)\s*(?:[x*]\s*|\s(?!\s*inch))(?P<name>\D.*)$"
+
+# PaymentMethod values as written over time -> one label per method
+PAYMENT_ALIASES = {
+    "cash on delivery": "Cash",
+    "cash on pick up": "Cash",
+    "ptm": "Paytm",
+    "upi": "UPI",
+    "razorpay": "Razorpay",
+}
+
+OTHER_CATEGORY = "Other"
+
+
+def _per_distinct(values: pd.Series, func) -> pd.Series:
+    """func applied to each distinct value once (dates, times and payment labels repeat heavily)."""
+    codes, distinct = pd.factorize(values.fillna("").astype(str))
+    result = pd.Series(func(pd.Series(distinct, dtype=object)))
+    return pd.Series(result.to_numpy()[codes], index=values.index)
+
+
+def _payment_label(payment: pd.Series) -> pd.Series:
+    payment = payment.str.replace(r"\s*=.*$", "", regex=True).str.strip()
+    return payment.str.lower().map(PAYMENT_ALIASES).fillna(payment.replace("", "-"))
+
+
+def prepare_orders(orders: pd.DataFrame) -> pd.DataFrame:
+    """One row per order from an orders.csv-shaped frame: date, hour, payment, total and the Items text."""
+    items = _per_distinct(orders["Items"], lambda s: s.str.strip())
+    # A few of the oldest rows have the items typed into CustomerName instead
+    legacy_names = orders.loc[items == "", "CustomerName"].fillna("").astype(str).str.strip()
+    items[legacy_names.index] = legacy_names
+    return pd.DataFrame({
+        "date": _per_distinct(orders["Date"], lambda s: pd.to_datetime(s, format="%d-%m-%Y", errors="coerce")),
+        "hour": _per_distinct(orders["Time"], lambda s: pd.to_numeric(s.str.slice(0, 2), errors="coerce")),
+        "payment": _per_distinct(orders["PaymentMethod"], _payment_label),
+        "total": pd.to_numeric(orders["GrandTotal"], errors="coerce").fillna(0.0),
+        "items": items,
+    }).reset_index(drop=True)
+
+
+def _parse_texts(texts: pd.Series) -> pd.DataFrame:
+    """
+    Line items for distinct Items texts, indexed by position in texts.
+    Structured lines carry their value (quantity x price); legacy lines carry their share
+    of the order by quantity, since free text has no prices.
+    """
+    parts = texts.str.split("; ").explode()
+    parts = parts[parts.notna() & (parts != "")]
+    # The same "1x Paneer Patty(Full)-₹25.00" appears thousands of times: run the regex once per distinct line
+    codes, distinct = pd.factorize(parts)
+    fields = pd.Series(distinct, dtype=object).str.extract(ITEM_RE)
+    structured = fields.iloc[codes].set_axis(parts.index).dropna()
+    structured.columns = ["quantity", "item", "size", "price"]
+    structured = structured.assign(
+        quantity=structured["quantity"].astype(int),
+        value=structured["quantity"].astype(int) * structured["price"].astype(float),
+        legacy=False,
+    ).drop(columns="price")
+
+    # Texts with no structured line at all are legacy free text
+    text = texts.drop(structured.index.unique())
+    text = text[text != ""].str.split(LEGACY_SPLIT, regex=True).explode().str.strip()
+    text = text[text != ""]
+    trailing = text.str.extract(LEGACY_TRAILING_QTY)
+    leading = text.str.extract(LEGACY_LEADING_QTY)
+    legacy = pd.DataFrame({
+        "quantity": trailing["qty"].fillna(leading["qty"]).fillna(1).astype(int),
+        "item": trailing["name"].fillna(leading["name"]).fillna(text).str.strip(),
+        "size": "",
+    })
+    legacy["value"] = legacy["quantity"] / legacy.groupby(level=0)["quantity"].transform("sum")
+    legacy["legacy"] = True
+    return pd.concat([structured, legacy])
+
+
+def parse_line_items(prepared: pd.DataFrame, categories: dict = None) -> pd.DataFrame:
+    """
+    Normalized line items (order, item, size, quantity, revenue, category, legacy) for prepare_orders() rows.
+    Structured "2x Chumin(Full)-₹50.00; ..." lines are valued at quantity x price; legacy free-text
+    lines share out their order's total by quantity. Each distinct Items text is parsed once.
+    """
+    codes, texts = pd.factorize(prepared["items"])
+    parsed = _parse_texts(pd.Series(texts, dtype=object)).rename_axis("text").reset_index()
+    orders = pd.DataFrame({"order": prepared.index, "text": codes, "total": prepared["total"].to_numpy()})
+    lines = orders.merge(parsed, on="text")
+    lines["revenue"] = lines["value"].where(~lines["legacy"], lines["value"] * lines["total"])
+    lines["category"] = lines["item"].str.lower().map(categories or {}).fillna(OTHER_CATEGORY)
+    return lines[["order", "item", "size", "quantity", "revenue", "category", "legacy"]]
+
+
+def sales_report(orders: pd.DataFrame, categories: dict = None, start=None, end=None, top_n: int = 10) -> dict:
+    """
+    Revenue by day, hour, category and payment method, top items and average ticket.
+    orders is orders.csv-shaped; categories maps lower-cased item names to menu categories;
+    start/end (inclusive dates) limit the period.
+    """
+    prepared = prepare_orders(orders)
+    if start is not None:
+        prepared = prepared[prepared["date"] >= pd.Timestamp(start)]
+    if end is not None:
+        prepared = prepared[prepared["date"] <= pd.Timestamp(end)]
+    lines = parse_line_items(prepared, categories)
+
+    count = len(prepared)
+    revenue = float(prepared["total"].sum())
+    totals = {"orders": ("total", "size"), "revenue": ("total", "sum")}
+    return {
+        "orders": count,
+        "revenue": round(revenue, 2),
+        "avg_ticket": round(revenue / count, 2) if count else 0.0,
+        "by_day": prepared.groupby("date").agg(**totals),
+        "by_hour": prepared.dropna(subset=["hour"]).astype({"hour": int}).groupby("hour").agg(**totals),
+        "by_payment": prepared.groupby("payment").agg(**totals).sort_values("revenue", ascending=False),
+        "by_category": lines.groupby("category")["revenue"].sum().sort_values(ascending=False).round(2),
+        "top_items": (
+            lines.groupby("item").agg(quantity=("quantity", "sum"), revenue=("revenue", "sum"))
+            .sort_values(["quantity", "revenue"], ascending=False).head(top_n).round(2)
+        ),
+        "legacy_lines": int(lines["legacy"].sum()),
+    }
+
+
+def synthetic_orders(n: int, legacy_share: float = 0.05, seed: int = 0) -> pd.DataFrame:
+    """orders.csv-shaped frame of n random orders over 2025, with some legacy free-text rows."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    menu = [("Paneer Patty", 25.0), ("Chumin", 50.0), ("Frooti20", 20.0), ("7 Inch Pizza Corn", 90.0),
+            ("Pastry Chocolate", 45.0), ("Aloo Patty", 20.0), ("Thums up 35", 35.0), ("Maggi", 40.0)]
+    names, prices = zip(*menu)
+    days = pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 365, n), unit="D")
+    seconds = rng.integers(10 * 3600, 22 * 3600, n)
+    counts = rng.integers(1, 4, n)
+
+    items, totals = [], []
+    for count in counts:
+        picks = rng.integers(0, len(menu), count)
+        qtys = rng.integers(1, 4, count)
+        items.append("; ".join(f"{q}x {names[p]}(Full)-₹{prices[p]:.2f}" for p, q in zip(picks, qtys)))
+        totals.append(float(sum(prices[p] * q for p, q in zip(picks, qtys))))
+    legacy = rng.random(n) < legacy_share
+    for i in np.flatnonzero(legacy):
+        items[i] = "Pastry+Frooti" if i % 2 else "Patty + 4 Pastry"
+
+    return pd.DataFrame({
+        "Date": days.strftime("%d-%m-%Y"),
+        "Time": [f"{s // 3600:02d}:{s % 3600 // 60:02d}:{s % 60:02d}" for s in seconds],
+        "OrderID": [f"2025-{i:08d}" for i in range(n)],
+        "CustomerName": "Bench",
+        "Items": items,
+        "PaymentMethod": rng.choice(["UPI", "Cash on Delivery", "Razorpay"], n),
+        "GrandTotal": totals,
+    })
+
+
+if __name__ == "__main__":
+    # python sales_analytics.py [orders.csv]   report for a real file, or a benchmark on a synthetic year
+    import sys
+    import time
+
+    if len(sys.argv) > 1:
+        report = sales_report(pd.read_csv(sys.argv[1], dtype=str, keep_default_na=False))
+        for key, value in report.items():
+            print(f"--- {key}\n{value}")
+        sys.exit()
+
+    for n in (10_000, 100_000, 300_000):   # ~100k orders is a busy year at the counter
+        df = synthetic_orders(n)
+        t0 = time.perf_counter()
+        report = sales_report(df)
+        ms = (time.perf_counter() - t0) * 1000
+        print(f"{n:>8,} orders: {ms:7.1f} ms  revenue ₹{report['revenue']:,.2f}, avg ticket ₹{report['avg_ticket']:.2f},"
+              f" {report['legacy_lines']} legacy lines")
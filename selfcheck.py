@@ -0,0 +1,18 @@
+# Helpers shared by the modules' `python <module>.py` self-checks
+import socket
+import time
+
+
+def free_port() -> int:
+    """A localhost port that nothing is listening on."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(check, timeout: float = 10.0, interval: float = 0.05):
+    """Poll check() until it is true; AssertionError after timeout seconds."""
+    deadline = time.time() + timeout
+    while not check():
+        assert time.time() < deadline, "timed out"
+        time.sleep(interval)
@@ -1,20 +1,55 @@
-import smtplib
 import os
+import zipfile
+from datetime import datetime
+from email.mime.application import MIMEApplication
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from email import encoders
+from io import BytesIO
 
+import pytz
 
-def send_daily_orders_email():
-    ORDERS_FILE = "orders.csv"
+from order_store import APP_DIR, ORDERS_DB, get_order_store
+from smtp_transport import get_secret, get_transport, smtp_settings
 
+ORDERS_FILE = os.path.join(APP_DIR, "orders.csv")
+
+
+def format_day_summary(summary: dict) -> str:
+    """Plain-text body for the daily report."""
+    lines = [
+        f"Daily orders report for {summary['day']}",
+        "",
+        f"Orders: {summary['orders']}",
+        f"Revenue: ₹{summary['revenue']:.2f}",
+    ]
+    if summary["by_payment"]:
+        lines += ["", "By payment method:"]
+        lines += [f"  {method:<20}{count:>5} orders  ₹{total:>10.2f}" for method, count, total in summary["by_payment"]]
+    if summary["top_items"]:
+        lines += ["", "Top items:"]
+        lines += [f"  {qty:>4} x {item}  (₹{total:.2f})" for item, qty, total in summary["top_items"]]
+    if summary["orders"]:
+        lines += ["", "The day's orders are attached as a zipped CSV."]
+    return "\n".join(lines)
+
+
+def build_day_attachment(store, day: str):
+    """(filename, bytes) of one day's orders as a zipped CSV; read through the date index only."""
+    buf = BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(f"orders_{day}.csv", store.export_csv(day=day))
+    return f"orders_{day}.zip", buf.getvalue()
+
+
+def send_daily_orders_email(day=None) -> bool:
+    """Email one day's orders (default: today, IST) with a summary; returns True once sent."""
     print("=== Starting Email Script ===")
 
     # Always return a string (fixes Pylance errors)
-    sender: str = os.getenv("SENDER_EMAIL") or ""
-    password: str = os.getenv("SENDER_PASSWORD") or ""
-    receiver: str = os.getenv("OWNER_EMAIL") or ""
+    settings = smtp_settings()
+    sender: str = settings["user"] or ""
+    password: str = settings["password"] or ""
+    receiver: str = get_secret("OWNER_EMAIL") or ""
 
     print(f"SENDER_EMAIL set? {'YES' if sender else 'NO'}")
     print(f"SENDER_PASSWORD set? {'YES' if password else 'NO'}")
@@ -23,45 +58,44 @@ def send_daily_orders_email():
     # Validate all secrets
     if not sender or not password or not receiver:
         print("ERROR: Missing required environment variables.")
-        return
+        return False
 
-    # Check file exists
-    if not os.path.exists(ORDERS_FILE):
-        print(f"ERROR: File not found: {ORDERS_FILE}")
-        return
+    day = str(day or datetime.now(pytz.timezone("Asia/Kolkata")).date())
 
     try:
-        print("Preparing email...")
+        print(f"Preparing report for {day}...")
+
+        # First run on a machine with only the legacy orders.csv imports it once
+        store = get_order_store(ORDERS_DB, legacy_csv=ORDERS_FILE)
+        summary = store.day_summary(day)
 
         msg = MIMEMultipart()
         msg["From"] = sender
         msg["To"] = receiver
-        msg["Subject"] = "Daily Orders Report - Dhaliwal Food Court"
+        msg["Subject"] = f"Daily Orders Report - Dhaliwal Food Court - {day}"
+        msg.attach(MIMEText(format_day_summary(summary), "plain"))
 
-        msg.attach(MIMEText("Attached is the daily consolidated orders.csv report.", "plain"))
-
-        # Attach file
-        with open(ORDERS_FILE, "rb") as f:
-            part = MIMEBase("application", "octet-stream")
-            part.set_payload(f.read())
-            encoders.encode_base64(part)
-            part.add_header("Content-Disposition", 'attachment; filename="orders.csv"')
+        if summary["orders"]:
+            filename, data = build_day_attachment(store, day)
+            part = MIMEApplication(data, Name=filename)
+            part["Content-Disposition"] = f'attachment; filename="{filename}"'
             msg.attach(part)
+            print(f"Attached {filename} ({summary['orders']} orders, {len(data)} bytes)")
 
-        print("Connecting to Gmail SMTP...")
-        with smtplib.SMTP("smtp.gmail.com", 587) as server:
-            server.starttls()
-            print("Logging in...")
-            server.login(sender, password)
-            print("Sending email...")
-            server.send_message(msg)
+        print(f"Sending email via {settings['server']}:{settings['port']}...")
+        get_transport(**settings).send(sender, [receiver], msg.as_bytes())
 
         print("=== Email sent successfully! ===")
+        return True
 
     except Exception as e:
         print("=== ERROR SENDING EMAIL ===")
         print(str(e))
+        return False
 
 
 if __name__ == "__main__":
-    send_daily_orders_email()
+    # python send_mail.py [YYYY-MM-DD]
+    import sys
+
+    send_daily_orders_email(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,146 @@
+import os
+import re
+import smtplib
+import threading
+import time
+
+
+def get_secret(key: str, default: str = "") -> str:
+    """Streamlit secret if available, else environment variable (send_mail.py runs outside Streamlit)."""
+    try:
+        import streamlit as st
+        return st.secrets[key]
+    except Exception:
+        return os.environ.get(key, default)
+
+
+def smtp_settings() -> dict:
+    """SMTP configuration shared by every email path."""
+    return {
+        "server": get_secret("SMTP_SERVER", "smtp.gmail.com"),
+        "port": int(get_secret("SMTP_PORT", "587")),
+        "user": get_secret("SENDER_EMAIL", ""),
+        "password": get_secret("SENDER_PASSWORD", ""),
+        # Only a local stand-in without TLS (e.g. aiosmtpd) should set SMTP_STARTTLS = "false"
+        "starttls": str(get_secret("SMTP_STARTTLS", "true")).strip().lower() not in ("false", "0", "no", "off"),
+    }
+
+
+def fix_eols(message):
+    """CRLF line endings; smtplib only does this itself for str messages, not bytes."""
+    if isinstance(message, bytes):
+        return re.sub(rb"(?:\r\n|\n|\r(?!\n))", b"\r\n", message)
+    return message
+
+
+class SMTPTransport:
+    """
+    Small pool of authenticated, kept-alive SMTP connections for one server/account.
+    Idle connections are health-checked with NOOP before reuse; a connection that
+    drops mid-send is replaced and the message retried once on a fresh session.
+    STARTTLS is required unless starttls=False, so credentials never go out in cleartext.
+    """
+
+    def __init__(self, server: str, port: int, user: str = "", password: str = "", starttls: bool = True,
+                 pool_size: int = 2, idle_timeout: float = 120.0, timeout: float = 20.0):
+        self.server = server
+        self.port = int(port)
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._idle = []   # [(connection, last_used)]
+        self._lock = threading.Lock()
+
+    def _connect(self) -> smtplib.SMTP:
+        conn = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+        try:
+            conn.ehlo()
+            if self.starttls:
+                if not conn.has_extn("starttls"):
+                    # Missing or stripped by something in between: don't send the password in the clear
+                    raise smtplib.SMTPNotSupportedError(f"{self.server} does not offer STARTTLS")
+                conn.starttls()
+                conn.ehlo()
+            # AUTH is skipped when the server (e.g. a local stand-in) doesn't offer it
+            if self.password and conn.has_extn("auth"):
+                conn.login(self.user, self.password)
+        except Exception:
+            self._close(conn)
+            raise
+        return conn
+
+    @staticmethod
+    def _close(conn: smtplib.SMTP):
+        try:
+            conn.quit()
+        except Exception:
+            conn.close()
+
+    def _acquire(self) -> smtplib.SMTP:
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn, last_used = self._idle.pop()
+            if time.monotonic() - last_used > self.idle_timeout:
+                self._close(conn)
+                continue
+            try:
+                if conn.noop()[0] == 250:
+                    return conn
+            except Exception:
+                pass
+            self._close(conn)
+        return self._connect()
+
+    def _release(self, conn: smtplib.SMTP):
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append((conn, time.monotonic()))
+                return
+        self._close(conn)
+
+    def send(self, sender: str, recipients: list, message):
+        """Send one message (str or bytes) over a pooled session."""
+        self.send_many([(sender, recipients, message)])
+
+    def send_many(self, messages: list):
+        """Send [(sender, recipients, message), ...] over a single authenticated session."""
+        conn = self._acquire()
+        try:
+            for sender, recipients, message in messages:
+                message = fix_eols(message)
+                try:
+                    conn.sendmail(sender, recipients, message)
+                except (smtplib.SMTPServerDisconnected, ConnectionError):
+                    self._close(conn)
+                    conn = self._connect()
+                    conn.sendmail(sender, recipients, message)
+        except Exception:
+            self._close(conn)
+            raise
+        self._release(conn)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+
+_transports_lock = threading.Lock()
+_transports = {}
+
+
+def get_transport(server: str, port: int, user: str = "", password: str = "", starttls: bool = True) -> SMTPTransport:
+    """Process-wide transport per server/account, so every email path shares one pool."""
+    key = (server, int(port), user, password, starttls)
+    with _transports_lock:
+        transport = _transports.get(key)
+        if transport is None:
+            transport = SMTPTransport(server, port, user, password, starttls)
+            _transports[key] = transport
+        return transport
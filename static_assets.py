@@ -0,0 +1,91 @@
+import base64
+import hashlib
+import mimetypes
+import os
+import threading
+from io import BytesIO
+
+from PIL import Image
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(APP_DIR, "static")            # served at app/static/ (server.enableStaticServing)
+ASSET_DIR = os.path.join(STATIC_DIR, "assets")
+STATIC_URL = "app/static/assets"
+
+
+class AssetManager:
+    """
+    Header images (QR codes, logo) prepared once per process: downsized for the size they are
+    shown at, written to static/assets/ under a content-hashed name and referenced by URL, so a
+    rerun ships a short URL instead of re-encoding the image into the page. Entries are rebuilt
+    when the source file's mtime changes. Without static serving, a data URI is built once
+    and reused instead.
+    """
+
+    def __init__(self, asset_dir: str = ASSET_DIR, url_prefix: str = STATIC_URL):
+        self.asset_dir = asset_dir
+        self.url_prefix = url_prefix
+        self._lock = threading.Lock()
+        self._assets = {}   # (path, max_px, static) -> (mtime_ns, url, nbytes)
+
+    def _build(self, path: str, max_px: int, static: bool):
+        with open(path, "rb") as f:
+            data = f.read()
+        mime = mimetypes.guess_type(path)[0] or "image/png"
+        with Image.open(BytesIO(data)) as im:
+            if max(im.size) > max_px:
+                im.thumbnail((max_px, max_px))
+                buf = BytesIO()
+                fmt = "PNG" if im.mode in ("RGBA", "LA", "P") else "JPEG"
+                im.save(buf, fmt, optimize=True, **({"quality": 90} if fmt == "JPEG" else {}))
+                data, mime = buf.getvalue(), f"image/{fmt.lower()}"
+
+        if not static:
+            return f"data:{mime};base64,{base64.b64encode(data).decode()}", len(data)
+
+        digest = hashlib.sha1(data).hexdigest()[:12]
+        stem = "".join(ch if ch.isalnum() else "_" for ch in os.path.splitext(os.path.basename(path))[0])
+        name = f"{stem}-{digest}{mimetypes.guess_extension(mime) or '.img'}"
+        dest = os.path.join(self.asset_dir, name)
+        if not os.path.exists(dest):
+            os.makedirs(self.asset_dir, exist_ok=True)
+            tmp = dest + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, dest)
+        return f"{self.url_prefix}/{name}", len(data)
+
+    def url(self, path: str, max_px: int = 480, static: bool = True) -> str:
+        """URL (or data URI) for an image; cached until the file changes. Missing files give ""."""
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return ""
+        key = (path, max_px, static)
+        with self._lock:
+            cached = self._assets.get(key)
+            if cached is None or cached[0] != mtime_ns:
+                url, nbytes = self._build(path, max_px, static)
+                cached = (mtime_ns, url, nbytes)
+                self._assets[key] = cached
+        return cached[1]
+
+    def stats(self) -> dict:
+        """Assets prepared in this process and their encoded size."""
+        with self._lock:
+            return {
+                "assets": len(self._assets),
+                "asset_bytes": sum(nbytes for _, _, nbytes in self._assets.values()),
+            }
+
+
+_manager_lock = threading.Lock()
+_asset_manager = None
+
+
+def get_asset_manager() -> AssetManager:
+    global _asset_manager
+    with _manager_lock:
+        if _asset_manager is None:
+            _asset_manager = AssetManager()
+        return _asset_manager
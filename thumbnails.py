@@ -0,0 +1,83 @@
+import hashlib
+import os
+import threading
+
+from PIL import Image
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+THUMB_DIR = os.path.join(APP_DIR, ".thumbs")
+
+GRID_WIDTH = 150      # width the menu grid displays tiles at
+RETINA_SCALE = 2      # pixels rendered per displayed pixel
+THUMB_FORMAT = "WEBP"
+THUMB_QUALITY = 80
+
+# (source path, mtime, width) -> generated thumbnail path, shared by all sessions
+_thumb_lock = threading.Lock()
+_thumb_index = {}
+
+
+def _thumb_name(src: str, mtime_ns: int, size: int, width: int) -> str:
+    """Content-addressed file name: changes whenever the source file or target size changes."""
+    key = f"{os.path.abspath(src)}|{mtime_ns}|{size}|{width}|{THUMB_FORMAT}|{THUMB_QUALITY}"
+    ext = "jpg" if THUMB_FORMAT == "JPEG" else THUMB_FORMAT.lower()
+    return f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.{ext}"
+
+
+def _render_thumbnail(src: str, dest: str, width: int):
+    with Image.open(src) as im:
+        im.thumbnail((width, width * 4))
+        if THUMB_FORMAT == "JPEG" and im.mode not in ("RGB", "L"):
+            im = im.convert("RGB")
+        elif im.mode not in ("RGB", "RGBA", "L"):
+            im = im.convert("RGBA")
+        os.makedirs(THUMB_DIR, exist_ok=True)
+        tmp = dest + ".tmp"
+        im.save(tmp, THUMB_FORMAT, quality=THUMB_QUALITY)
+    os.replace(tmp, dest)
+
+
+def get_thumbnail(src: str, width: int = GRID_WIDTH * RETINA_SCALE) -> str:
+    """
+    Return a downscaled copy of a local menu image, generating it on first use.
+    Remote URLs, missing files and unreadable images are returned unchanged.
+    """
+    if not src or src.startswith("http"):
+        return src
+    try:
+        st_ = os.stat(src)
+    except OSError:
+        return src
+
+    index_key = (src, st_.st_mtime_ns, width)
+    with _thumb_lock:
+        cached = _thumb_index.get(index_key)
+    if cached:
+        return cached
+
+    dest = os.path.join(THUMB_DIR, _thumb_name(src, st_.st_mtime_ns, st_.st_size, width))
+    if not os.path.exists(dest):
+        try:
+            _render_thumbnail(src, dest, width)
+        except Exception:
+            return src
+
+    with _thumb_lock:
+        _thumb_index[index_key] = dest
+    return dest
+
+
+def cached_thumbnail(src: str, mtime_ns: int, width: int = GRID_WIDTH * RETINA_SCALE):
+    """Thumbnail already generated for this file version, or None; a dict lookup, no filesystem access."""
+    with _thumb_lock:
+        return _thumb_index.get((src, mtime_ns, width))
+
+
+def prewarm_thumbnails(image_paths) -> int:
+    """Generate thumbnails for every local image in the menu; returns how many are ready."""
+    ready = 0
+    for src in set(image_paths):
+        src = str(src).strip()
+        if src and get_thumbnail(src) != src:
+            ready += 1
+    return ready